@@ -1,7 +1,13 @@
 import time
 import re
-from typing import List, Dict
+from typing import List, Optional
 from database import get_unprocessed_events, mark_event_processed, insert_validation_result
+from profiling import profiled
+from issue_codes import Issue, IssueCode, render_issues, validation_status
+from records import EventRecord
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+IPV4_PATTERN = re.compile(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$')
 
 class Agent1Validator:
     """
@@ -9,83 +15,81 @@ class Agent1Validator:
     Validates clickstream events for data quality and compliance issues
     """
     
-    def __init__(self):
-        self.name = "Agent 1: Data Validator"
+    def __init__(self, shard: Optional[str] = None):
+        self.shard = shard  # storage shard this instance consumes (None = main database)
+        self.name = "Agent 1: Data Validator" + (f" [{shard}]" if shard else "")
+        self.tag = f"[Agent 1{'/' + shard if shard else ''}]"
+        self.running = True
         self.status = "Idle"
+        self.last_heartbeat = None
         self.events_processed = 0
         self.issues_found = 0
         
-    def validate_event(self, event: Dict) -> tuple[str, List[str]]:
+    @profiled
+    def validate_event(self, event: EventRecord) -> tuple[str, List[Issue]]:
         """
-        Validate a single event and return status + issues
-        Returns: (status, issues_list)
+        Validate a single event and return status + issues (the record is never modified)
+        Returns: (status, issues_list) - issues are coded; render with render_issues()
         """
         issues = []
         
         # Check required fields
-        if not event.get('session_id'):
-            issues.append("Missing session_id")
-        if not event.get('event_type'):
-            issues.append("Missing event_type")
-        if not event.get('page_url'):
-            issues.append("Missing page_url")
+        if not event.session_id:
+            issues.append(Issue(IssueCode.MISSING_SESSION_ID))
+        if not event.event_type:
+            issues.append(Issue(IssueCode.MISSING_EVENT_TYPE))
+        if not event.page_url:
+            issues.append(Issue(IssueCode.MISSING_PAGE_URL))
             
         # Check consent flag (CRITICAL - only consented events allowed)
-        if event.get('consent_given') is None or event.get('consent_given') == 0:
-            issues.append("COMPLIANCE VIOLATION: Event captured without user consent - only consented events are allowed")
+        if not event.consent_given:
+            issues.append(Issue(IssueCode.NO_CONSENT))
         
-        # Check email encryption (CRITICAL for clickstream data)
-        if event.get('user_email'):
-            email = event.get('user_email')
-            # Check if email is SHA256 hashed (64 hex characters)
+        email = event.user_email
+        if email:
+            # Check email encryption (CRITICAL for clickstream data):
+            # a SHA256 hash (64 hex characters) counts as encrypted
             is_hashed = len(email) == 64 and all(c in '0123456789abcdef' for c in email.lower())
+            if not is_hashed and not event.encrypt_email:
+                issues.append(Issue(IssueCode.UNENCRYPTED_EMAIL))
             
-            if not is_hashed and not event.get('encrypt_email'):
-                issues.append("SECURITY VIOLATION: Unencrypted email detected - clickstream must only capture encrypted emails")
-            elif is_hashed:
-                # Email is properly hashed, mark as encrypted
-                event['encrypt_email'] = True
-            
-        # Validate email format if present
-        if event.get('user_email'):
-            email = event.get('user_email')
-            email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if not re.match(email_pattern, email):
-                issues.append(f"Invalid email format: {email}")
+            # Validate email format (the address itself is never copied into the issue)
+            if not EMAIL_PATTERN.match(email):
+                issues.append(Issue(IssueCode.INVALID_EMAIL))
                 
         # Check for suspicious IP patterns (basic check)
-        if event.get('ip_address'):
-            ip = event.get('ip_address')
+        ip = event.ip_address
+        if ip:
             # Check if it's a valid IPv4 format
-            ip_pattern = r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$'
-            if not re.match(ip_pattern, ip):
-                issues.append(f"Invalid IP format: {ip}")
+            if not IPV4_PATTERN.match(ip):
+                issues.append(Issue(IssueCode.INVALID_IP, ip))
             # Check for localhost/private IPs (optional warning)
             elif ip.startswith('127.') or ip.startswith('0.'):
-                issues.append(f"Localhost/invalid IP detected: {ip}")
+                issues.append(Issue(IssueCode.LOCAL_IP, ip))
         
-        # Determine status - compliance violations are always ERROR
-        if any("VIOLATION" in issue for issue in issues):
-            status = "ERROR"
-        elif any("Missing" in issue for issue in issues):
-            status = "ERROR"
-        else:
-            status = "VALID"
+        # Determine status - compliance violations and missing fields are always ERROR
+        status = validation_status(issues)
             
         return status, issues
     
+    def stop(self):
+        """Ask the polling loop to exit (e.g. when its shard is detached)"""
+        self.running = False
+    
     def run(self):
         """Main agent loop - polls database for new events"""
         print(f"🤖 {self.name} started")
         
-        while True:
+        while self.running:
             try:
+                self.last_heartbeat = time.time()
+                
                 # Get unprocessed events
-                events = get_unprocessed_events()
+                events = get_unprocessed_events(self.shard)
                 
                 if events:
                     self.status = f"Processing {len(events)} events"
-                    print(f"[Agent 1] Found {len(events)} new events to validate")
+                    print(f"{self.tag} Found {len(events)} new events to validate")
                     
                     for event in events:
                         # Validate event
@@ -94,20 +98,21 @@ class Agent1Validator:
                         # Log result
                         if issues:
                             self.issues_found += 1
-                            print(f"[Agent 1] ⚠️  Event {event['id']} - {status}: {', '.join(issues)}")
+                            print(f"{self.tag} ⚠️  Event {event.id} - {status}: {', '.join(render_issues(issues))}")
                         else:
-                            print(f"[Agent 1] ✅ Event {event['id']} - VALID")
+                            print(f"{self.tag} ✅ Event {event.id} - VALID")
                         
                         # Save validation result
                         insert_validation_result(
-                            event_id=event['id'],
-                            session_id=event['session_id'],
+                            event_id=event.id,
+                            session_id=event.session_id,
                             status=status,
-                            issues=issues
+                            issues=issues,
+                            shard=self.shard
                         )
                         
                         # Mark as processed
-                        mark_event_processed(event['id'])
+                        mark_event_processed(event.id, shard=self.shard)
                         self.events_processed += 1
                     
                     self.status = f"Validated {self.events_processed} events | Found {self.issues_found} issues"
@@ -118,7 +123,7 @@ class Agent1Validator:
                 time.sleep(3)
                 
             except Exception as e:
-                print(f"[Agent 1] ❌ Error: {e}")
+                print(f"{self.tag} ❌ Error: {e}")
                 self.status = f"Error: {e}"
                 time.sleep(5)
 
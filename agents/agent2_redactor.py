@@ -1,11 +1,13 @@
 import time
 import re
-from typing import List, Dict
+from typing import Optional, Tuple, Union
 from database import (
     get_unredacted_sessions, 
     mark_validation_processed, 
     insert_redacted_session
 )
+from profiling import profiled
+from records import EventRecord, ValidationRecord, RedactionRecord
 
 class Agent2Redactor:
     """
@@ -13,9 +15,13 @@ class Agent2Redactor:
     Redacts PII from validated sessions to ensure GDPR/privacy compliance
     """
     
-    def __init__(self):
-        self.name = "Agent 2: Privacy Redactor"
+    def __init__(self, shard: Optional[str] = None):
+        self.shard = shard  # storage shard this instance consumes (None = main database)
+        self.name = "Agent 2: Privacy Redactor" + (f" [{shard}]" if shard else "")
+        self.tag = f"[Agent 2{'/' + shard if shard else ''}]"
+        self.running = True
         self.status = "Idle"
+        self.last_heartbeat = None
         self.sessions_processed = 0
         self.pii_redacted = 0
         
@@ -36,17 +42,28 @@ class Agent2Redactor:
             return f"{parts[0]}.{parts[1]}.*.*"
         return ip
     
-    def apply_redaction(self, session: Dict) -> tuple[str, str, List[str], str]:
+    def apply_redaction(self, session: Union[ValidationRecord, EventRecord]) -> RedactionRecord:
         """
-        Apply redaction rules to a session
-        Returns: (redacted_email, redacted_ip, redaction_log, compliance_status)
+        Apply redaction rules to a session and count the PII fields masked
+        Returns: RedactionRecord(redacted_email, redacted_ip, redaction_log, compliance_status)
+        """
+        redaction, pii_count = self.redact(session)
+        self.pii_redacted += pii_count
+        return redaction
+    
+    @profiled
+    def redact(self, session: Union[ValidationRecord, EventRecord]) -> Tuple[RedactionRecord, int]:
+        """
+        Apply redaction rules without touching counters (an EventRecord on the fused path)
+        Returns: (RedactionRecord, number of PII fields masked)
         """
         redaction_log = []
+        pii_count = 0
         
         # Get original values
-        original_email = session.get('user_email', '')
-        original_ip = session.get('ip_address', '')
-        consent_given = session.get('consent_given', 0)
+        original_email = session.user_email
+        original_ip = session.ip_address
+        consent_given = session.consent_given
         
         # Check consent status
         if not consent_given:
@@ -67,8 +84,8 @@ class Agent2Redactor:
                 else:
                     # Hash unencrypted email with SHA256
                     redacted_email = self.hash_email(original_email)
-                    redaction_log.append(f"Email encrypted with SHA256: {original_email} → {redacted_email[:16]}...")
-                    self.pii_redacted += 1
+                    redaction_log.append(f"Email encrypted with SHA256 → {redacted_email[:16]}...")
+                    pii_count += 1
             else:
                 redacted_email = None
                 
@@ -76,47 +93,55 @@ class Agent2Redactor:
             redacted_ip = self.redact_ip(original_ip) if original_ip else None
             
             if original_ip:
-                redaction_log.append(f"IP generalized: {original_ip} → {redacted_ip}")
-                self.pii_redacted += 1
+                redaction_log.append(f"IP generalized → {redacted_ip}")
+                pii_count += 1
                 
             compliance_status = "COMPLIANT"
         
-        return redacted_email, redacted_ip, redaction_log, compliance_status
+        return RedactionRecord(redacted_email, redacted_ip, redaction_log, compliance_status), pii_count
+    
+    def stop(self):
+        """Ask the polling loop to exit (e.g. when its shard is detached)"""
+        self.running = False
     
     def run(self):
         """Main agent loop - polls database for unredacted sessions"""
         print(f"🔒 {self.name} started")
         
-        while True:
+        while self.running:
             try:
+                self.last_heartbeat = time.time()
+                
                 # Get sessions needing redaction
-                sessions = get_unredacted_sessions()
+                sessions = get_unredacted_sessions(self.shard)
                 
                 if sessions:
                     self.status = f"Redacting {len(sessions)} sessions"
-                    print(f"[Agent 2] Found {len(sessions)} sessions to redact")
+                    print(f"{self.tag} Found {len(sessions)} sessions to redact")
                     
                     for session in sessions:
                         # Apply redaction
-                        redacted_email, redacted_ip, redaction_log, compliance_status = self.apply_redaction(session)
+                        redaction = self.apply_redaction(session)
                         
                         # Log result
-                        print(f"[Agent 2] 🛡️  Session {session['session_id']} - {compliance_status}")
-                        for log_entry in redaction_log:
+                        print(f"{self.tag} 🛡️  Session {session.session_id} - {redaction.compliance_status}")
+                        for log_entry in redaction.redaction_log:
                             print(f"           {log_entry}")
                         
                         # Save redacted session
                         insert_redacted_session(
-                            session_id=session['session_id'],
-                            email_redacted=redacted_email,
-                            ip_redacted=redacted_ip,
+                            session_id=session.session_id,
+                            email_redacted=redaction.email_redacted,
+                            ip_redacted=redaction.ip_redacted,
                             event_count=1,  # Could aggregate multiple events per session
-                            redaction_log=redaction_log,
-                            compliance_status=compliance_status
+                            redaction_log=redaction.redaction_log,
+                            compliance_status=redaction.compliance_status,
+                            shard=self.shard,
+                            event_id=session.event_id
                         )
                         
                         # Mark as processed
-                        mark_validation_processed(session['id'])
+                        mark_validation_processed(session.id, shard=self.shard)
                         self.sessions_processed += 1
                     
                     self.status = f"Redacted {self.sessions_processed} sessions | {self.pii_redacted} PII fields masked"
@@ -127,7 +152,7 @@ class Agent2Redactor:
                 time.sleep(3)
                 
             except Exception as e:
-                print(f"[Agent 2] ❌ Error: {e}")
+                print(f"{self.tag} ❌ Error: {e}")
                 self.status = f"Error: {e}"
                 time.sleep(5)
 
@@ -1,8 +1,12 @@
 import time
 import os
-from typing import Dict
-from database import get_summary_stats, insert_agent_insight, get_recent_insights
-from openai import OpenAI
+from typing import Dict, List
+from database import get_summary_stats, insert_agent_insight, get_recent_insights, search_records
+from profiling import profiled
+from agents.insight_scheduler import InsightScheduler
+
+# Seconds before an OpenAI request is abandoned (the client default is 600)
+LLM_TIMEOUT = 30.0
 
 class Agent3Insights:
     """
@@ -10,32 +14,49 @@ class Agent3Insights:
     Generates real-time insights and answers questions about clickstream data
     """
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, scheduler: InsightScheduler = None):
         self.name = "Agent 3: Insight Analyst"
         self.status = "Initializing..."
         self.insights_generated = 0
         self.questions_answered = 0
         
-        # Initialize OpenAI client
+        # OpenAI client is created on first LLM call (see `client`)
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
-            self.llm_available = True
+        self._client = None
+        self.llm_available = bool(self.api_key)
+        if self.llm_available:
             print(f"🧠 {self.name} initialized with OpenAI")
         else:
-            self.client = None
-            self.llm_available = False
             print(f"⚠️  {self.name} running in MOCK mode (no API key)")
         
         self.last_stats = None
+        # Retrieval context for Q&A; redaction logs stay out of LLM prompts
+        self.retrieval_kinds = ['insights', 'validation_issues']
+        self.retrieval_limit = 5
+        # Budgeted, change-triggered LLM calls (see InsightScheduler)
+        self.scheduler = scheduler or InsightScheduler()
+        self.last_heartbeat = None
+    
+    @property
+    def client(self):
+        """OpenAI client, imported and constructed lazily to keep start-up cheap"""
+        if self._client is None and self.llm_available:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key, timeout=LLM_TIMEOUT)
+        return self._client
         
+    @profiled
     def generate_insight(self, stats: Dict) -> str:
         """Generate insight using LLM based on current statistics"""
         if not self.llm_available:
             # Mock insight for demo without API key
             if stats['issues_detected'] > 0:
-                return f"⚠️ Alert: {stats['issues_detected']} data quality issues detected. Agent 2 is processing these sessions for compliance."
-            return f"✅ System healthy: {stats['total_events']} events processed, {stats['consent_percentage']}% with consent."
+                insight = f"⚠️ Alert: {stats['issues_detected']} data quality issues detected. Agent 2 is processing these sessions for compliance."
+            else:
+                insight = f"✅ System healthy: {stats['total_events']} events processed, {stats['consent_percentage']}% with consent."
+            # Charge an estimate so budget behaviour is the same without an API key
+            self.scheduler.record_usage(len(insight) // 4)
+            return insight
         
         try:
             prompt = f"""You are an analytics assistant monitoring a clickstream data pipeline that processes data collected from web analytics (which may or may not have explicit user consent).
@@ -62,24 +83,41 @@ Do NOT recommend implementing consent collection - the system is designed to han
                 temperature=0.7
             )
             
+            usage = getattr(response, 'usage', None)
+            self.scheduler.record_usage(usage.total_tokens if usage else self.scheduler.est_tokens_per_call)
             return response.choices[0].message.content.strip()
             
         except Exception as e:
             print(f"[Agent 3] LLM Error: {e}")
             return f"⚠️ Monitoring {stats['total_events']} events ({stats['consent_percentage']}% consent rate)"
     
-    def answer_question(self, question: str, stats: Dict) -> str:
-        """Answer user question using LLM"""
+    def retrieve_context(self, question: str) -> List[Dict]:
+        """Pull the top full-text matches for a question"""
+        try:
+            return search_records(question, kinds=self.retrieval_kinds,
+                                  limit=self.retrieval_limit, match_any=True)['results']
+        except Exception as e:
+            print(f"[Agent 3] Retrieval Error: {e}")
+            return []
+    
+    @profiled
+    def answer_question(self, question: str, stats: Dict, use_retrieval: bool = True) -> str:
+        """Answer user question using LLM (optionally grounded in matching records)"""
+        records = self.retrieve_context(question) if use_retrieval else []
+        
         if not self.llm_available:
             # Mock responses for demo
             if "consent" in question.lower():
                 return f"Based on current data: {stats['consent_percentage']}% of users ({stats['consent_count']} out of {stats['total_events']}) have provided consent."
             elif "issue" in question.lower() or "problem" in question.lower():
                 return f"Currently tracking {stats['issues_detected']} data quality issues that Agent 1 has flagged."
+            elif records:
+                return f"Most relevant record ({records[0]['kind']} #{records[0]['id']}): {records[0]['snippet']}"
             else:
                 return f"I'm monitoring {stats['total_events']} events. {stats['redacted_count']} sessions have been redacted for privacy compliance."
         
         try:
+            context = "\n".join(f"- [{r['kind']} #{r['id']} @ {r['timestamp']}] {r['snippet']}" for r in records)
             prompt = f"""You are an analytics assistant monitoring a privacy-preserving clickstream data pipeline.
 
 Current Statistics:
@@ -90,6 +128,9 @@ Current Statistics:
 
 Context: This system processes clickstream data (which may or may not have user consent). Agent 2 automatically redacts PII from events without consent to ensure privacy compliance.
 
+Relevant records (full-text matches):
+{context or "- none"}
+
 Question: {question}
 
 Provide a clear, factual answer with specific numbers from the data. Focus on how the privacy system is working, not on suggesting consent collection improvements."""
@@ -109,19 +150,8 @@ Provide a clear, factual answer with specific numbers from the data. Focus on ho
             return f"Error processing question. Current stats: {stats['total_events']} events, {stats['consent_percentage']}% consent rate."
     
     def should_generate_insight(self, current_stats: Dict) -> bool:
-        """Determine if we should generate a new insight"""
-        if not self.last_stats:
-            return True
-            
-        # Generate insight if issues increased
-        if current_stats['issues_detected'] > self.last_stats.get('issues_detected', 0):
-            return True
-            
-        # Generate insight if total events increased by 5+
-        if current_stats['total_events'] - self.last_stats.get('total_events', 0) >= 5:
-            return True
-            
-        return False
+        """Determine if we should generate a new insight (change detection + budget)"""
+        return self.scheduler.should_generate(current_stats)
     
     def run(self):
         """Main agent loop - monitors statistics and generates insights"""
@@ -130,13 +160,15 @@ Provide a clear, factual answer with specific numbers from the data. Focus on ho
         
         while True:
             try:
+                self.last_heartbeat = time.time()
+                
                 # Get current statistics
                 stats = get_summary_stats()
                 
                 # Check if we should generate an insight
                 if self.should_generate_insight(stats) and stats['total_events'] > 0:
                     self.status = "Generating insight..."
-                    print(f"[Agent 3] 💡 Generating insight...")
+                    print(f"[Agent 3] 💡 Generating insight ({self.scheduler.last_reason})...")
                     
                     insight_text = self.generate_insight(stats)
                     
@@ -152,7 +184,9 @@ Provide a clear, factual answer with specific numbers from the data. Focus on ho
                     
                     self.last_stats = stats.copy()
                 
-                self.status = f"Monitoring | {self.insights_generated} insights generated"
+                budget = self.scheduler.budget_status()
+                self.status = (f"Monitoring | {self.insights_generated} insights generated"
+                               f" | {int(budget['calls_available'])} LLM calls left this hour")
                 
                 # Poll every 10 seconds (less frequent than other agents)
                 time.sleep(10)
@@ -0,0 +1,180 @@
+import time
+import math
+from typing import Callable, Dict, Optional
+
+class TokenBucket:
+    """Refilling budget: `capacity` units per `period` seconds"""
+
+    def __init__(self, capacity: float, period: float, clock: Callable[[], float]):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def level(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def available(self, amount: float = 1) -> bool:
+        self._refill()
+        return self.tokens >= amount
+
+    def consume(self, amount: float = 1):
+        """Spend tokens; actual usage may exceed the estimate and go into debt"""
+        self._refill()
+        self.tokens -= amount
+
+class EWMADetector:
+    """
+    Exponentially weighted mean/variance of one metric.
+    Flags a sample whose z-score against the running estimate exceeds the threshold.
+    """
+
+    def __init__(self, alpha: float = 0.1, z_threshold: float = 3.5, warmup: int = 5, min_std: float = 0.01,
+                 var_alpha: float = 0.02):
+        self.alpha = alpha
+        # Variance is smoothed more slowly than the mean so a few quiet ticks
+        # cannot shrink it enough to turn ordinary jitter into a large z-score
+        self.var_alpha = var_alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.min_std = min_std
+        self.mean = None
+        self.var = 0.0
+        self.samples = 0
+        self.last_z = 0.0
+
+    def update(self, value: float, noise_std: float = 0.0) -> bool:
+        """
+        Add a sample; returns True if it is anomalous
+        noise_std is the sampling noise expected at the current mean; the z-score
+        never uses a smaller std, so ordinary count/rate jitter is not flagged.
+        """
+        self.samples += 1
+        if self.mean is None:
+            self.mean = value
+            return False
+
+        std = max(math.sqrt(self.var), self.min_std, noise_std)
+        self.last_z = (value - self.mean) / std
+        anomalous = self.samples > self.warmup and abs(self.last_z) > self.z_threshold
+
+        # Plain running averages until there are enough samples for the EWMA weights
+        alpha = max(self.alpha, 1 / self.samples)
+        var_alpha = max(self.var_alpha, 1 / self.samples)
+        diff = value - self.mean
+        self.mean += alpha * diff
+        # Outliers move the mean but their variance contribution is clipped at the
+        # threshold, so a level shift cannot hide itself by inflating the std
+        if self.samples > self.warmup:
+            limit = self.z_threshold * std
+            diff = min(max(diff, -limit), limit)
+        self.var = (1 - var_alpha) * (self.var + var_alpha * diff * diff)
+        return anomalous
+
+class InsightScheduler:
+    """
+    Decides when Agent 3 may call the LLM.
+    An insight fires only when change detection flags the error rate, consent
+    rate or event volume, and only if the debounce interval has passed and the
+    hourly call/token budgets allow it. Anomalies seen while blocked are
+    coalesced into one pending trigger.
+    """
+
+    def __init__(self, calls_per_hour: int = 12, tokens_per_hour: int = 6000,
+                 min_interval: float = 60, est_tokens_per_call: int = 400,
+                 z_threshold: float = 3.5, alpha: float = 0.1, var_alpha: float = 0.02, min_rate_events: int = 20,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.min_rate_events = min_rate_events
+        self.min_interval = min_interval
+        self.est_tokens_per_call = est_tokens_per_call
+        self.call_budget = TokenBucket(calls_per_hour, 3600, clock)
+        self.token_budget = TokenBucket(tokens_per_hour, 3600, clock)
+        self.detectors = {
+            'error_rate': EWMADetector(alpha, z_threshold, var_alpha=var_alpha),
+            'consent_rate': EWMADetector(alpha, z_threshold, var_alpha=var_alpha),
+            'volume': EWMADetector(alpha, z_threshold, min_std=1.0, var_alpha=var_alpha),
+        }
+        self.prev_stats = None
+        # Events/issues/consents accumulated until a rate sample has min_rate_events
+        self.rate_window = [0, 0, 0]
+        self.last_insight_at = None
+        self.pending_reason = None
+        self.last_reason = None
+        self.skipped = 0
+
+    def observe(self, stats: Dict) -> Optional[str]:
+        """Feed one stats snapshot to the detectors; returns a change reason, if any"""
+        prev = self.prev_stats
+        self.prev_stats = stats.copy()
+        if prev is None:
+            return "first snapshot" if stats['total_events'] > 0 else None
+
+        new_events = stats['total_events'] - prev['total_events']
+        reasons = []
+        # Sampling-noise floors: Poisson for event counts, binomial for rates
+        volume = self.detectors['volume']
+        if volume.update(new_events, math.sqrt(max(volume.mean or 0, 0))):
+            reasons.append(f"volume z={volume.last_z:.1f}")
+
+        # Rates are sampled over windows of at least min_rate_events events,
+        # since a rate over a handful of events is mostly rounding
+        window = self.rate_window
+        window[0] += new_events
+        window[1] += stats['issues_detected'] - prev['issues_detected']
+        window[2] += stats['consent_count'] - prev['consent_count']
+        if window[0] >= self.min_rate_events:
+            events, issues, consents = window
+            self.rate_window = [0, 0, 0]
+            if self.detectors['error_rate'].update(issues / events, self._rate_noise('error_rate', events)):
+                reasons.append(f"error rate z={self.detectors['error_rate'].last_z:.1f}")
+            if self.detectors['consent_rate'].update(consents / events, self._rate_noise('consent_rate', events)):
+                reasons.append(f"consent rate z={self.detectors['consent_rate'].last_z:.1f}")
+
+        return ", ".join(reasons) or None
+
+    def _rate_noise(self, name: str, events: int) -> float:
+        """Binomial std of a rate measured over `events` events at the detector's mean"""
+        p = min(max(self.detectors[name].mean or 0.0, 0.0), 1.0)
+        return math.sqrt(p * (1 - p) / events)
+
+    def should_generate(self, stats: Dict) -> bool:
+        """Observe stats and decide whether to spend an LLM call now"""
+        reason = self.observe(stats)
+        if reason:
+            self.pending_reason = reason
+        if not self.pending_reason:
+            return False
+
+        now = self.clock()
+        if self.last_insight_at is not None and now - self.last_insight_at < self.min_interval:
+            self.skipped += 1
+            return False
+        if not (self.call_budget.available() and self.token_budget.available(self.est_tokens_per_call)):
+            self.skipped += 1
+            return False
+
+        self.call_budget.consume()
+        self.last_insight_at = now
+        self.last_reason = self.pending_reason
+        self.pending_reason = None
+        return True
+
+    def record_usage(self, tokens: int):
+        """Charge the token budget with what a call actually used"""
+        self.token_budget.consume(tokens)
+
+    def budget_status(self) -> Dict:
+        return {
+            'calls_available': round(max(self.call_budget.level(), 0), 2),
+            'tokens_available': round(max(self.token_budget.level(), 0)),
+            'skipped': self.skipped,
+            'last_reason': self.last_reason,
+        }
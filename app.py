@@ -1,30 +1,36 @@
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import threading
 import time
 import json
-from dotenv import load_dotenv
 import os
+import zlib
+from dotenv import load_dotenv
 
-# Load environment variables
+# Load .env before the modules below read CLICKSTREAM_* settings at import time
 load_dotenv()
 
 # Import database functions
 from database import (
-    init_db, insert_event, get_recent_events, 
+    init_db, insert_event_once, get_recent_events, 
     get_recent_insights, get_summary_stats,
-    get_connection
+    get_connection, get_dedup_stats, search_records,
+    get_issue_counts, get_recent_validation_results, get_recent_redactions,
+    insert_events_batch, get_timeseries, has_pending_work
 )
+from sharding import SHARD_MODE, list_shards, shard_for_session
+from dedup import event_fingerprint, normalize_event_key
+import profiling
+from exporter import EXPORT_TABLES, EXPORT_FORMATS, iter_export, export_filename
 
-# Import agents
-from agents.agent1_validator import Agent1Validator
-from agents.agent2_redactor import Agent2Redactor
-from agents.agent3_insights import Agent3Insights
+# Agents (and openai) are imported lazily when the agent threads start,
+# so serving the dashboard or importing this module for a CLI stays cheap
 
 app = Flask(__name__)
+started_at = time.time()
 
-# Global agent instances
-agent1 = None
-agent2 = None
+# Global agent instances: Agents 1 and 2 run one instance per storage shard
+# ({shard: agent}, shard None = main database); Agent 3 is global
+shard_agents = {'agent1': {}, 'agent2': {}}
 agent3 = None
 
 # Agent status tracking
@@ -34,31 +40,58 @@ agent_status = {
     'agent3': 'Starting...'
 }
 
-def run_agent1():
-    """Run Agent 1 in background thread"""
-    global agent1, agent_status
-    agent1 = Agent1Validator()
-    while True:
+# Background threads keyed by (agent, shard) and the max heartbeat age (seconds)
+# before an agent counts as stalled
+agent_threads = {}
+HEARTBEAT_TIMEOUT = {'agent1': 15, 'agent2': 15, 'agent3': 45}
+# Agents that gate /readyz; Agent 3 waits on the LLM API, so it is reported but not required
+READINESS_AGENTS = ('agent1', 'agent2')
+
+# CLICKSTREAM_FUSED=1 validates and redacts events inline on ingest (one
+# transaction per event/batch); the polling agents still run for other writers
+FUSED_PIPELINE = os.getenv('CLICKSTREAM_FUSED', '').lower() in ('1', 'true', 'yes')
+fused_pipeline = None
+_fused_lock = threading.Lock()
+
+def run_agent1(shard=None):
+    """Run Agent 1 for one shard in background thread"""
+    global agent_status
+    from agents.agent1_validator import Agent1Validator
+    agent = shard_agents['agent1'][shard] = Agent1Validator(shard=shard)
+    while agent.running:
         try:
-            agent1.run()
+            agent.run()
         except Exception as e:
             agent_status['agent1'] = f"Error: {e}"
             time.sleep(5)
 
-def run_agent2():
-    """Run Agent 2 in background thread"""
-    global agent2, agent_status
-    agent2 = Agent2Redactor()
-    while True:
+def run_agent2(shard=None):
+    """Run Agent 2 for one shard in background thread"""
+    global agent_status
+    from agents.agent2_redactor import Agent2Redactor
+    agent = shard_agents['agent2'][shard] = Agent2Redactor(shard=shard)
+    while agent.running:
         try:
-            agent2.run()
+            agent.run()
         except Exception as e:
             agent_status['agent2'] = f"Error: {e}"
             time.sleep(5)
 
+def get_fused_pipeline():
+    """Fused validate+redact pipeline, created on first use (None unless enabled)"""
+    global fused_pipeline
+    if not FUSED_PIPELINE:
+        return None
+    with _fused_lock:
+        if fused_pipeline is None:
+            from agents.fused_pipeline import FusedPipeline
+            fused_pipeline = FusedPipeline()
+    return fused_pipeline
+
 def run_agent3():
     """Run Agent 3 in background thread"""
     global agent3, agent_status
+    from agents.agent3_insights import Agent3Insights
     api_key = os.getenv('OPENAI_API_KEY')
     agent3 = Agent3Insights(api_key=api_key)
     while True:
@@ -79,8 +112,7 @@ def submit_event():
     try:
         data = request.json
         
-        # Insert event into database
-        event_id = insert_event(
+        event_fields = dict(
             session_id=data.get('session_id'),
             user_email=data.get('user_email'),
             event_type=data.get('event_type'),
@@ -90,10 +122,23 @@ def submit_event():
             encrypt_email=data.get('encrypt_email', False)
         )
         
+        # Client-supplied id makes retries idempotent; fingerprint is opt-in
+        event_key = normalize_event_key(data.get('event_id'))
+        if not event_key and data.get('fingerprint'):
+            event_key = event_fingerprint(**event_fields)
+        
+        # Insert event into database (validated and redacted inline in fused mode)
+        pipeline = get_fused_pipeline()
+        if pipeline:
+            event_id, is_duplicate = pipeline.submit(event_key=event_key, **event_fields)
+        else:
+            event_id, is_duplicate = insert_event_once(event_key=event_key, **event_fields)
+        
         return jsonify({
             'success': True,
             'event_id': event_id,
-            'message': 'Event submitted! Watch agents react below...'
+            'duplicate': is_duplicate,
+            'message': 'Duplicate event ignored.' if is_duplicate else 'Event submitted! Watch agents react below...'
         })
         
     except Exception as e:
@@ -102,6 +147,57 @@ def submit_event():
             'error': str(e)
         }), 400
 
+# Limits for collector batches (beacons are small; this guards against gzip bombs)
+MAX_BATCH_EVENTS = 500
+MAX_BATCH_BYTES = 2 * 1024 * 1024
+
+@app.route('/collect', methods=['POST'])
+def collect():
+    """Accept a (optionally gzip-compressed) batch of collector events from static/script.js"""
+    try:
+        # Bound the body as sent (compressed or not) before reading it
+        if (request.content_length or 0) > MAX_BATCH_BYTES:
+            return jsonify({'error': 'Batch too large'}), 413
+        body = request.stream.read(MAX_BATCH_BYTES + 1)
+        if len(body) > MAX_BATCH_BYTES:
+            return jsonify({'error': 'Batch too large'}), 413
+        if request.args.get('encoding') == 'gzip' or request.headers.get('Content-Encoding') == 'gzip':
+            decompressor = zlib.decompressobj(wbits=31)
+            body = decompressor.decompress(body, MAX_BATCH_BYTES)
+            if decompressor.unconsumed_tail:
+                return jsonify({'error': 'Batch too large'}), 413
+        
+        payload = json.loads(body)
+        events = payload.get('events', []) if isinstance(payload, dict) else payload
+        if not isinstance(events, list) or len(events) > MAX_BATCH_EVENTS:
+            return jsonify({'error': f'Expected a list of at most {MAX_BATCH_EVENTS} events'}), 400
+        
+        # The collector never sends addresses; IP comes from the connection
+        ip_address = request.remote_addr
+        pipeline = get_fused_pipeline()
+        insert = pipeline.submit_batch if pipeline else insert_events_batch
+        entries = [event for event in events if isinstance(event, dict)]
+        result = insert([
+            {
+                'event_key': event.get('event_id'),
+                'session_id': event.get('session_id'),
+                'user_email': event.get('user_email'),
+                'event_type': event.get('event_type'),
+                'page_url': event.get('page_url'),
+                'ip_address': ip_address,
+                'consent_given': event.get('consent_given', False),
+                'encrypt_email': event.get('encrypt_email', False)
+            }
+            for event in entries
+        ])
+        result['rejected'] += len(events) - len(entries)
+        return jsonify({'success': True, **result})
+        
+    except (ValueError, zlib.error) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/stats')
 def get_stats():
     """Get current statistics"""
@@ -111,6 +207,22 @@ def get_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/issue_types')
+def issue_types():
+    """Get Agent 1 issue counts by type"""
+    try:
+        return jsonify(get_issue_counts())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ingest_stats')
+def ingest_stats():
+    """Get duplicate filter counters"""
+    try:
+        return jsonify(get_dedup_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/recent_events')
 def recent_events():
     """Get recent events"""
@@ -129,36 +241,163 @@ def recent_insights():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Downsampling ladder for /api/timeseries (seconds); larger spans use whole days
+TIMESERIES_STEPS = [60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400]
+MAX_TIMESERIES_POINTS = 2000
+
+def timeseries_step(span: int, points: int) -> int:
+    """Smallest ladder step that fits `span` seconds into at most `points` buckets"""
+    wanted = -(-span // points)
+    for step in TIMESERIES_STEPS:
+        if step >= wanted:
+            return step
+    return -(-wanted // 86400) * 86400
+
+@app.route('/api/timeseries')
+def timeseries():
+    """Per-bucket event/consent/error/redaction counts from the rollup tables"""
+    try:
+        until = int(request.args.get('until', time.time()))
+        since = int(request.args.get('since', until - int(float(request.args.get('hours', 24)) * 3600)))
+        points = min(int(request.args.get('points', 300)), MAX_TIMESERIES_POINTS)
+        if since >= until or points <= 0:
+            return jsonify({'error': 'Expected since < until and points > 0'}), 400
+        
+        step = int(request.args.get('step', 0)) or timeseries_step(until - since, points)
+        step = -(-step // 60) * 60
+        if -(-(until - since) // step) > MAX_TIMESERIES_POINTS:
+            return jsonify({'error': f'At most {MAX_TIMESERIES_POINTS} buckets; increase step'}), 400
+        
+        metrics = request.args.get('metrics')
+        return jsonify(get_timeseries(
+            since, until, step,
+            metrics=metrics.split(',') if metrics else None,
+            event_type=request.args.get('event_type'),
+            page_url=request.args.get('page_url'),
+            group_by=request.args.get('group_by')
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def current_agent_status() -> dict:
+    """Status line per agent; per-shard Agent 1/2 instances are summed"""
+    validators = list(shard_agents['agent1'].values())
+    redactors = list(shard_agents['agent2'].values())
+    
+    if len(validators) > 1:
+        agent1_status = (f"{len(validators)} shards | Validated {sum(a.events_processed for a in validators)} events"
+                         f" | Found {sum(a.issues_found for a in validators)} issues")
+    else:
+        agent1_status = validators[0].status if validators else 'Not started'
+    
+    if len(redactors) > 1:
+        agent2_status = (f"{len(redactors)} shards | Redacted {sum(a.sessions_processed for a in redactors)} sessions"
+                         f" | {sum(a.pii_redacted for a in redactors)} PII fields masked")
+    else:
+        agent2_status = redactors[0].status if redactors else 'Not started'
+    
+    if fused_pipeline:
+        agent1_status += (f" | Fast path: validated {fused_pipeline.validator.events_processed}"
+                          f", {fused_pipeline.validator.issues_found} with issues")
+        agent2_status += (f" | Fast path: redacted {fused_pipeline.redactor.sessions_processed}"
+                          f", {fused_pipeline.redactor.pii_redacted} PII fields")
+    
+    return {
+        'agent1': agent1_status,
+        'agent2': agent2_status,
+        'agent3': agent3.status if agent3 else 'Not started',
+        'fused': fused_pipeline.status if fused_pipeline else ('Idle' if FUSED_PIPELINE else 'Disabled')
+    }
+
 @app.route('/api/agent_status')
 def get_agent_status():
     """Get current status of all agents"""
     try:
-        status = {
-            'agent1': agent1.status if agent1 else 'Not started',
-            'agent2': agent2.status if agent2 else 'Not started',
-            'agent3': agent3.status if agent3 else 'Not started'
-        }
-        return jsonify(status)
+        return jsonify(current_agent_status())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Worst state first, so an agent is only as healthy as its least healthy shard
+HEALTH_ORDER = ['not started', 'dead', 'stalled', 'starting', 'running']
+
+def agent_health(name: str) -> str:
+    """Lifecycle state of one agent: not started, starting, running, stalled or dead"""
+    states = []
+    for (agent_name, shard), thread in list(agent_threads.items()):
+        if agent_name != name:
+            continue
+        agent = agent3 if name == 'agent3' else shard_agents[name].get(shard)
+        heartbeat = getattr(agent, 'last_heartbeat', None)
+        if not thread.is_alive():
+            states.append('dead')
+        elif heartbeat is None:
+            states.append('starting')
+        elif time.time() - heartbeat > HEARTBEAT_TIMEOUT[name]:
+            states.append('stalled')
+        else:
+            states.append('running')
+    return min(states, key=HEALTH_ORDER.index) if states else 'not started'
+
+@app.route('/healthz')
+def liveness():
+    """Liveness: the web process is up and serving"""
+    return jsonify({'status': 'alive', 'uptime_seconds': round(time.time() - started_at, 3)})
+
+@app.route('/readyz')
+def readiness():
+    """Readiness: database reachable and the ingest agents (1 and 2) have a recent heartbeat"""
+    agents = {
+        'agent1': agent_health('agent1'),
+        'agent2': agent_health('agent2'),
+        'agent3': agent_health('agent3')
+    }
+    try:
+        conn = get_connection()
+        conn.execute("SELECT 1")
+        conn.close()
+        database_ok = True
+    except Exception:
+        database_ok = False
+    
+    ready = database_ok and all(agents[name] == 'running' for name in READINESS_AGENTS)
+    return jsonify({
+        'ready': ready,
+        'database': 'ok' if database_ok else 'unavailable',
+        'agents': agents
+    }), 200 if ready else 503
+
+@app.route('/api/profile/stats')
+def profile_stats():
+    """DB helper/query timings and slow-query log (CLICKSTREAM_PROFILE=1 only)"""
+    if not profiling.ENABLED:
+        return jsonify({'error': 'Profiling disabled; set CLICKSTREAM_PROFILE=1'}), 404
+    try:
+        top = int(request.args.get('top', 20))
+    except ValueError:
+        return jsonify({'error': 'top must be an integer'}), 400
+    return jsonify(profiling.get_stats(top=max(top, 1)))
+
+@app.route('/api/profile/sample')
+def profile_sample():
+    """Sample agent thread stacks for N seconds; returns folded stacks for flame graphs"""
+    if not profiling.ENABLED:
+        return jsonify({'error': 'Profiling disabled; set CLICKSTREAM_PROFILE=1'}), 404
+    try:
+        seconds = float(request.args.get('seconds', 5))
+    except ValueError:
+        return jsonify({'error': 'seconds must be a number'}), 400
+    if not 0 < seconds <= 60:
+        return jsonify({'error': 'seconds must be in (0, 60]'}), 400
+    stacks = profiling.sample_stacks(seconds, thread_prefix=request.args.get('threads', 'agent'))
+    return Response("\n".join(stacks) + "\n", mimetype='text/plain')
+
 @app.route('/api/agent1_output')
 def get_agent1_output():
     """Get Agent 1 validation results"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT vr.*, re.session_id, re.event_type, re.page_url
-            FROM validation_results vr
-            JOIN raw_events re ON vr.event_id = re.id
-            ORDER BY vr.timestamp DESC
-            LIMIT 10
-        """)
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        results = get_recent_validation_results(limit=10)
         return jsonify(results)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -167,21 +406,53 @@ def get_agent1_output():
 def get_agent2_output():
     """Get Agent 2 redaction results"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM redacted_sessions
-            ORDER BY timestamp DESC
-            LIMIT 10
-        """)
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        results = get_recent_redactions(limit=10)
+        return jsonify(results)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/search')
+def search():
+    """Full-text search over insights, validation issues and redaction logs"""
+    query = request.args.get('q', '')
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    kinds = request.args.get('kinds')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+        results = search_records(
+            query,
+            kinds=kinds.split(',') if kinds else None,
+            limit=limit,
+            after=request.args.get('cursor')
+        )
         return jsonify(results)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/export/<table>')
+def export_table(table):
+    """Stream a bulk export of redacted sessions or validation results"""
+    fmt = request.args.get('format', 'ndjson')
+    compress = request.args.get('gzip', '1') not in ('0', 'false')
+    if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Supported tables: {EXPORT_TABLES}, formats: {EXPORT_FORMATS}"}), 400
+    
+    chunks = iter_export(table, fmt, request.args.get('since'), request.args.get('until'), compress)
+    if compress:
+        mimetype = 'application/gzip'
+    else:
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(table, fmt, compress)}"'}
+    )
+
 @app.route('/ask_agent3', methods=['POST'])
 def ask_agent3():
     """Ask Agent 3 a question"""
@@ -216,11 +487,7 @@ def stream():
         while True:
             try:
                 # Send agent status updates
-                status = {
-                    'agent1': agent1.status if agent1 else 'Not started',
-                    'agent2': agent2.status if agent2 else 'Not started',
-                    'agent3': agent3.status if agent3 else 'Not started'
-                }
+                status = current_agent_status()
                 yield f"data: {json.dumps({'type': 'agent_status', 'data': status})}\n\n"
                 
                 # Send latest insight
@@ -236,21 +503,67 @@ def stream():
     
     return Response(event_stream(), mimetype='text/event-stream')
 
-def start_agents():
-    """Start all agents in background threads"""
-    print("🚀 Starting all agents...")
+def start_shard_agents(shard=None):
+    """Start Agent 1 and Agent 2 consumers for one shard"""
+    suffix = f"-{shard}" if shard else ""
     
     # Start Agent 1
-    thread1 = threading.Thread(target=run_agent1, daemon=True)
+    thread1 = threading.Thread(target=run_agent1, args=(shard,), name=f'agent1{suffix}', daemon=True)
     thread1.start()
+    agent_threads[('agent1', shard)] = thread1
     
     # Start Agent 2
-    thread2 = threading.Thread(target=run_agent2, daemon=True)
+    thread2 = threading.Thread(target=run_agent2, args=(shard,), name=f'agent2{suffix}', daemon=True)
     thread2.start()
+    agent_threads[('agent2', shard)] = thread2
+
+def stop_shard_agents(shard):
+    """Stop Agent 1 and Agent 2 consumers for one shard"""
+    for name in shard_agents:
+        agent = shard_agents[name].pop(shard, None)
+        if agent:
+            agent.stop()
+        agent_threads.pop((name, shard), None)
+
+def supervise_day_shards(interval: float = 30):
+    """Day sharding: consume today's shard, drain past days once, stop for detached ones
+    
+    Writes only go to today's shard, so a past day whose backlog is empty
+    never gets new work: its consumers are retired and the shard is not
+    polled again.
+    """
+    retired = set()
+    while True:
+        live = set(list_shards())
+        today = shard_for_session(None)
+        for shard in sorted(live - retired):
+            if shard == today or has_pending_work(shard):
+                if ('agent1', shard) not in agent_threads:
+                    start_shard_agents(shard)
+            else:
+                stop_shard_agents(shard)
+                retired.add(shard)
+        for (name, shard) in list(agent_threads):
+            if name in shard_agents and shard not in live:
+                stop_shard_agents(shard)
+        retired &= live
+        time.sleep(interval)
+
+def start_agents():
+    """Start all agents in background threads"""
+    print("🚀 Starting all agents...")
+    
+    # Agents 1 and 2 consume each shard in parallel
+    if SHARD_MODE == 'day':
+        threading.Thread(target=supervise_day_shards, name='shard-supervisor', daemon=True).start()
+    else:
+        for shard in list_shards():
+            start_shard_agents(shard)
     
     # Start Agent 3
-    thread3 = threading.Thread(target=run_agent3, daemon=True)
+    thread3 = threading.Thread(target=run_agent3, name='agent3', daemon=True)
     thread3.start()
+    agent_threads[('agent3', None)] = thread3
     
     print("✅ All agents started in background threads")
 
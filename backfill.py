@@ -0,0 +1,140 @@
+"""
+Backfill: re-run Agent 1 validation and Agent 2 redaction rules over history.
+
+Raw events are split into primary-key id chunks per shard (ids are only unique
+within a shard; see sharding.py). Worker processes validate and redact each
+chunk; the parent writes every chunk's output and its checkpoint in one
+transaction, so an interrupted run resumes exactly where it stopped.
+Output goes to backfill_validation_results (with coded backfill_validation_issues)
+and backfill_redacted_sessions in the main database, keyed by run id and shard,
+leaving the live agent tables untouched.
+
+Usage:
+    python backfill.py --version rules-v2 --since "2024-01-01" --until "2024-02-01"
+    python backfill.py --start-id 1 --end-id 5000000 --workers 8
+    python backfill.py --resume 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+import database
+from database import (
+    get_connection, init_db, create_backfill_run, get_backfill_run, get_backfill_run_shards,
+    finish_backfill_run, get_completed_chunks, get_event_id_bounds, get_events_in_range,
+    insert_backfill_chunk
+)
+from sharding import list_shards
+from agents.agent1_validator import Agent1Validator
+from agents.agent2_redactor import Agent2Redactor
+from issue_codes import render_issues
+
+# Per-process agent instances (set by _init_worker)
+_validator = None
+_redactor = None
+
+def _init_worker(db_name: str):
+    """Create one validator/redactor per worker process"""
+    global _validator, _redactor
+    database.DB_NAME = db_name
+    _validator = Agent1Validator()
+    _redactor = Agent2Redactor()
+
+def process_chunk(task: Tuple[Optional[str], int, int, Optional[str], Optional[str]]):
+    """Validate and redact one id chunk of a shard; returns rows for the parent to write"""
+    shard, chunk_start, chunk_end, since, until = task
+    validations, redactions, coded = [], [], []
+
+    for event in get_events_in_range(chunk_start, chunk_end, since, until, shard):
+        status, issues = _validator.validate_event(event)
+        validations.append((event.id, event.session_id, status, json.dumps(render_issues(issues))))
+        coded.extend((event.id, int(issue.code), issue.detail) for issue in issues)
+
+        email, ip, redaction_log, compliance_status = _redactor.apply_redaction(event)
+        redactions.append((event.id, event.session_id, email, ip,
+                           json.dumps(redaction_log), compliance_status))
+
+    return shard, chunk_start, chunk_end, validations, redactions, coded
+
+def plan_chunks(start_id: int, end_id: int, chunk_size: int, done: set) -> List[Tuple[int, int]]:
+    """Split [start_id, end_id] into id chunks, skipping checkpointed ones"""
+    return [(lo, min(lo + chunk_size, end_id + 1))
+            for lo in range(start_id, end_id + 1, chunk_size)
+            if lo not in done]
+
+def run_backfill(run_id: int, workers: int):
+    """Process all pending chunks of a run in parallel"""
+    run = get_backfill_run(run_id)
+    if not run:
+        raise SystemExit(f"❌ Backfill run {run_id} not found")
+
+    completed = get_completed_chunks(run_id)
+    tasks = [(shard, lo, hi, run['since'], run['until'])
+             for shard, (start_id, end_id) in get_backfill_run_shards(run_id).items()
+             for lo, hi in plan_chunks(start_id, end_id, run['chunk_size'],
+                                       {start for name, start in completed if name == shard})]
+    print(f"🔁 Backfill run {run_id} ({run['rules_version']}): {len(tasks)} chunks pending, {workers} workers")
+
+    started = time.time()
+    rows = 0
+    with Pool(workers, initializer=_init_worker, initargs=(database.DB_NAME,)) as pool:
+        results = pool.imap_unordered(process_chunk, tasks)
+        for done, (shard, lo, hi, validations, redactions, coded) in enumerate(results, 1):
+            insert_backfill_chunk(run_id, shard, lo, hi, validations, redactions, coded)
+            rows += len(validations)
+            elapsed = time.time() - started
+            print(f"   [{done}/{len(tasks)}] {shard or 'main'} ids {lo}-{hi - 1}: {len(validations)} rows "
+                  f"| {rows / elapsed if elapsed else 0:.0f} rows/s")
+
+    finish_backfill_run(run_id)
+    print(f"✅ Backfill run {run_id} complete: {rows} rows in {time.time() - started:.1f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-validate and re-redact historical events")
+    parser.add_argument('--db', default=database.DB_NAME, help="SQLite database file")
+    parser.add_argument('--version', help="Rules version label for the output (default: timestamp)")
+    parser.add_argument('--start-id', type=int, help="First raw_events id (inclusive, per shard)")
+    parser.add_argument('--end-id', type=int, help="Last raw_events id (inclusive, per shard)")
+    parser.add_argument('--since', help="Only events with timestamp >= SINCE")
+    parser.add_argument('--until', help="Only events with timestamp < UNTIL")
+    parser.add_argument('--chunk-size', type=int, default=10_000, help="Events per chunk/transaction")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--resume', type=int, metavar='RUN_ID', help="Resume an interrupted run")
+    args = parser.parse_args(argv)
+
+    database.DB_NAME = args.db
+    init_db()
+
+    # WAL lets worker reads proceed while the parent commits chunks
+    conn = get_connection()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+    if args.resume:
+        run_id = args.resume
+    else:
+        bounds = {}
+        for shard in list_shards():
+            min_id, max_id = get_event_id_bounds(args.since, args.until, shard)
+            if min_id is None:
+                continue
+            start_id = max(args.start_id or min_id, min_id)
+            end_id = min(args.end_id or max_id, max_id)
+            if start_id <= end_id:
+                bounds[shard] = (start_id, end_id)
+        if not bounds:
+            print("⚠️  No events in the requested range")
+            return 0
+        version = args.version or datetime.now().strftime("rules-%Y%m%d%H%M%S")
+        run_id = create_backfill_run(version, bounds, args.since, args.until, args.chunk_size)
+
+    run_backfill(run_id, args.workers)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
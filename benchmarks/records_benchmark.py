@@ -0,0 +1,115 @@
+"""
+Record benchmark: per-event memory and throughput of the Agent 1/2 hot path.
+
+Fills a throwaway database with N unprocessed events and reports:
+- fetch: dict(sqlite3.Row) per event (old behaviour) vs EventRecord tuples
+  from get_unprocessed_events - retained bytes/event (tracemalloc) and events/sec
+- agents: validate_event + apply_redaction over the fetched records, events/sec
+
+Usage (from the repository root):
+    python benchmarks/records_benchmark.py --events 50000 --runs 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+from agents.agent1_validator import Agent1Validator
+from agents.agent2_redactor import Agent2Redactor
+
+def seed(count: int):
+    """Insert `count` unprocessed events with a realistic mix of issues"""
+    rows = [
+        (f"session_{i % 997}",
+         "a" * 64 if i % 3 else f"user{i}@example.com",
+         ("click", "page_view", "purchase")[i % 3],
+         f"/products/{i % 50}",
+         f"10.{i % 256}.{i % 7}.{i % 200}" if i % 11 else "127.0.0.1",
+         i % 5 != 0,
+         i % 3 != 0)
+        for i in range(count)
+    ]
+    conn = database.get_connection()
+    conn.executemany("""
+        INSERT INTO raw_events (session_id, user_email, event_type, page_url, ip_address, consent_given, encrypt_email)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+def fetch_dicts():
+    """The pre-record read path: SELECT * and one dict per row"""
+    conn = database.get_connection()
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT * FROM raw_events WHERE processed_by_agent1 = 0 ORDER BY timestamp ASC").fetchall()
+    events = [dict(row) for row in rows]
+    conn.close()
+    return events
+
+def fetch_records():
+    return database.get_unprocessed_events()
+
+def retained_bytes(fetch) -> int:
+    """Bytes still allocated after fetch() returns, i.e. held by the rows"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = fetch()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rows
+    return after - before
+
+def best_rate(func, count: int, runs: int) -> float:
+    """Median events/sec of func() over `runs` runs"""
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return count / statistics.median(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-event memory and throughput of the agent hot path")
+    parser.add_argument('--events', type=int, default=50_000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "records-benchmark.db")
+        database.init_db()
+        seed(args.events)
+
+        dict_bytes = retained_bytes(fetch_dicts) / args.events
+        record_bytes = retained_bytes(fetch_records) / args.events
+        dict_rate = best_rate(fetch_dicts, args.events, args.runs)
+        record_rate = best_rate(fetch_records, args.events, args.runs)
+
+        validator, redactor = Agent1Validator(), Agent2Redactor()
+        records = fetch_records()
+
+        def agents():
+            for event in records:
+                validator.validate_event(event)
+                redactor.apply_redaction(event)
+
+        agent_rate = best_rate(agents, args.events, args.runs)
+
+    print(f"🧮 {args.events} events, median of {args.runs} runs")
+    print(f"   {'':24}{'bytes/event':>12}{'events/sec':>14}")
+    print(f"   {'fetch: dict(Row)':24}{dict_bytes:12.0f}{dict_rate:14,.0f}")
+    print(f"   {'fetch: EventRecord':24}{record_bytes:12.0f}{record_rate:14,.0f}")
+    print(f"   {'validate + redact':24}{'':12}{agent_rate:14,.0f}")
+    print(f"   records: {100 * (1 - record_bytes / dict_bytes):.0f}% less memory, "
+          f"{record_rate / dict_rate:.2f}x fetch throughput")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Start-up benchmark: how long until app.py can serve its first request.
+
+Runs fresh interpreters (so nothing is cached in sys.modules) and reports:
+- time to import app and answer GET /healthz with lazy agent loading
+- the same with every agent and openai imported eagerly (old behaviour)
+- the slowest top-level imports from `python -X importtime -c "import app"`
+
+Usage (from the repository root):
+    python benchmarks/startup_benchmark.py --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST = """
+import time
+t0 = time.perf_counter()
+{imports}
+import app
+status = app.app.test_client().get('/healthz').status_code
+print(time.perf_counter() - t0, status)
+"""
+
+EAGER_IMPORTS = """
+import openai
+import agents.agent1_validator, agents.agent2_redactor, agents.agent3_insights
+"""
+
+def time_first_request(imports: str = "") -> float:
+    """Seconds from interpreter start of user code to the first /healthz response"""
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST.format(imports=imports)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    elapsed, status = result.stdout.split()
+    assert status == "200", f"/healthz returned {status}"
+    return float(elapsed)
+
+def import_breakdown(top: int):
+    """Modules imported directly by app.py, by cumulative import time (microseconds)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nesting depth is encoded as two spaces per level after the separator
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1 or name.strip() == "app":
+            rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app start-up time")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args(argv)
+
+    lazy = [time_first_request() for _ in range(args.runs)]
+    eager = [time_first_request(EAGER_IMPORTS) for _ in range(args.runs)]
+
+    print(f"⏱️  Time to first /healthz response (median of {args.runs})")
+    print(f"   lazy agents/LLM client : {statistics.median(lazy) * 1000:8.1f} ms")
+    print(f"   eager imports          : {statistics.median(eager) * 1000:8.1f} ms")
+    print()
+    print(f"📦 Top {args.top} imports under `import app`")
+    print(f"   {'cumulative ms':>13}  {'self ms':>8}  module")
+    for cumulative_us, self_us, name in import_breakdown(args.top):
+        print(f"   {cumulative_us / 1000:13.1f}  {self_us / 1000:8.1f}  {name}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,88 @@
 import sqlite3
 import json
 from datetime import datetime
-from typing import List, Dict, Optional
+import os
+import re
+import base64
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple
+from dedup import DuplicateFilter, normalize_event_key
+from sharding import SHARD_DIR, list_shards, shard_for_session, shard_path
+from profiling import profiled, connection_factory
+from issue_codes import Issue, IssueCode, render_issues, parse_legacy_issue, issue_label
+from records import EventRecord, ValidationRecord, RedactionRecord, EVENT_COLUMNS, VALIDATION_COLUMNS, row_factory
 
 DB_NAME = "clickstream.db"
 
-def get_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_NAME)
+# In-memory front for duplicate event keys (Bloom filter + LRU)
+dedup_filter = DuplicateFilter()
+
+# Full-text indexes: kind -> (source table, text column, FTS5 table)
+SEARCH_INDEXES = {
+    'insights': ('agent_insights', 'insight_text', 'agent_insights_fts'),
+    'validation_issues': ('validation_results', 'issues', 'validation_issues_fts'),
+    'redaction_logs': ('redacted_sessions', 'redaction_log', 'redaction_logs_fts'),
+}
+
+# Agent 2 log entries that used to quote the original email/IP ("IP generalized: 10.1.2.3 → 10.1.*.*")
+LEGACY_LOG_VALUE = re.compile(r'^(Email encrypted with SHA256|IP generalized): .* → ')
+
+# sqlite3.Connection unless CLICKSTREAM_PROFILE is set (see profiling.py)
+CONNECTION_FACTORY = connection_factory()
+
+# Rollup resolutions in seconds (per-minute and per-hour buckets)
+ROLLUP_RESOLUTIONS = (60, 3600)
+ROLLUP_METRICS = ('events', 'consented', 'validation_errors', 'redactions')
+# page_url of the rollup rows that total all pages per (resolution, bucket, event_type)
+ALL_PAGES = '*'
+
+# Fused pipeline step: validate + redact one new event
+ProcessEvent = Callable[[EventRecord], Tuple[str, List[Issue], RedactionRecord]]
+
+# Collector event fields stored as text; anything else rejects the event
+BATCH_TEXT_FIELDS = ('session_id', 'user_email', 'event_type', 'page_url', 'ip_address')
+
+# Shards whose schema exists (created on first write in day mode)
+_ready_shards = set()
+_ready_lock = threading.Lock()
+_fan_out_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='shard-fanout')
+
+def get_connection(shard: Optional[str] = None, create: bool = False):
+    """
+    Get database connection (main database, or one shard - see sharding.py)
+    Shards are only created when create=True (the write path); readers get an
+    error instead of silently recreating a detached shard.
+    """
+    if shard is None:
+        conn = sqlite3.connect(DB_NAME, factory=CONNECTION_FACTORY)
+    elif create:
+        if shard not in _ready_shards:
+            with _ready_lock:
+                if shard not in _ready_shards:
+                    init_db(shard)
+        conn = sqlite3.connect(shard_path(shard), factory=CONNECTION_FACTORY)
+    else:
+        conn = sqlite3.connect(f"file:{shard_path(shard)}?mode=rw", uri=True, factory=CONNECTION_FACTORY)
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db():
-    """Initialize database with all required tables"""
-    conn = get_connection()
+def fan_out(query: Callable[[Optional[str]], object]) -> List[Tuple[Optional[str], object]]:
+    """Run query(shard) on every live shard (in parallel when sharded)"""
+    shards = list_shards()
+    if len(shards) == 1:
+        return [(shards[0], query(shards[0]))]
+    return list(zip(shards, _fan_out_pool.map(query, shards)))
+
+def init_db(shard: Optional[str] = None):
+    """Initialize database with all required tables (main database plus any shards)"""
+    if shard is not None:
+        os.makedirs(SHARD_DIR, exist_ok=True)
+        conn = sqlite3.connect(shard_path(shard), factory=CONNECTION_FACTORY)
+        conn.row_factory = sqlite3.Row
+    else:
+        conn = get_connection()
     cursor = conn.cursor()
     
     # Table 1: Raw events from web form
@@ -28,10 +97,27 @@ def init_db():
             consent_given BOOLEAN DEFAULT 1,
             encrypt_email BOOLEAN DEFAULT 0,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            processed_by_agent1 BOOLEAN DEFAULT 0
+            processed_by_agent1 BOOLEAN DEFAULT 0,
+            event_key TEXT
         )
     """)
     
+    # Older databases predate event_key; add it before indexing
+    columns = [row['name'] for row in cursor.execute("PRAGMA table_info(raw_events)")]
+    if 'event_key' not in columns:
+        cursor.execute("ALTER TABLE raw_events ADD COLUMN event_key TEXT")
+    
+    # Client-supplied event ids are unique; NULL keys are never deduplicated
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_raw_events_event_key
+        ON raw_events(event_key)
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_raw_events_timestamp
+        ON raw_events(timestamp)
+    """)
+    
     # Table 2: Agent 1 validation results
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS validation_results (
@@ -60,6 +146,10 @@ def init_db():
         )
     """)
     
+    # Time-range reads (dashboard, export) on the agent output tables
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_validation_results_timestamp ON validation_results(timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_redacted_sessions_timestamp ON redacted_sessions(timestamp)")
+    
     # Table 4: Agent 3 insights
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS agent_insights (
@@ -71,44 +161,379 @@ def init_db():
         )
     """)
     
-    conn.commit()
-    conn.close()
-    print("✅ Database initialized successfully")
-
-def insert_event(session_id: str, user_email: str, event_type: str, 
-                 page_url: str, ip_address: str, consent_given: bool, encrypt_email: bool = False) -> int:
-    """Insert a new clickstream event"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    # Full-text search: external-content FTS5 tables kept in sync by triggers
+    for table, column, fts in SEARCH_INDEXES.values():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,))
+        is_new = cursor.fetchone() is None
+        if is_new and column == 'redaction_log':
+            _scrub_redaction_logs(cursor)
+        
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts}
+            USING fts5({column}, content='{table}', content_rowid='id')
+        """)
+        cursor.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+            END;
+        """)
+        
+        # Index rows written before the FTS table existed
+        if is_new:
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    
+    # Agent 1 issues as interned codes, one row per issue, for grouped index scans
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'validation_issues'")
+    migrate_issues = cursor.fetchone() is None
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS validation_issues (
+            validation_id INTEGER NOT NULL,
+            issue_code INTEGER NOT NULL,
+            detail TEXT,
+            FOREIGN KEY (validation_id) REFERENCES validation_results(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_validation_issues_code ON validation_issues(issue_code)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_validation_issues_validation ON validation_issues(validation_id)")
+    
+    # Code pre-existing free-text issues once, re-rendering them without raw emails
+    if migrate_issues:
+        cursor.execute("SELECT id, issues FROM validation_results WHERE issues IS NOT NULL")
+        for row in cursor.fetchall():
+            issues = [issue for issue in map(parse_legacy_issue, json.loads(row['issues'])) if issue]
+            cursor.executemany(
+                "INSERT INTO validation_issues (validation_id, issue_code, detail) VALUES (?, ?, ?)",
+                [(row['id'], int(issue.code), issue.detail) for issue in issues]
+            )
+            cursor.execute("UPDATE validation_results SET issues = ? WHERE id = ?",
+                           (json.dumps(render_issues(issues)), row['id']))
+    
+    # Time-series rollups: counters per (resolution, epoch bucket, event_type, page),
+    # upserted by the write paths so charts never scan raw_events
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_rollups'")
+    seed_rollups = cursor.fetchone() is None
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS event_rollups (
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            event_type TEXT NOT NULL,
+            page_url TEXT NOT NULL,
+            events INTEGER NOT NULL DEFAULT 0,
+            consented INTEGER NOT NULL DEFAULT 0,
+            validation_errors INTEGER NOT NULL DEFAULT 0,
+            redactions INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (resolution, bucket, event_type, page_url)
+        ) WITHOUT ROWID
+    """)
+    
+    # Aggregate history once (per page and all pages); redactions are counted via processed validation results
+    if seed_rollups:
+        cursor.executemany("""
+            INSERT INTO event_rollups
+            (resolution, bucket, event_type, page_url, events, consented, validation_errors, redactions)
+            SELECT ?, CAST(strftime('%s', re.timestamp) AS INTEGER) / ? * ?, re.event_type,
+                   COALESCE(?, re.page_url, ''), COUNT(*), SUM(re.consent_given = 1),
+                   COALESCE(SUM(vr.validation_status != 'VALID'), 0), COALESCE(SUM(vr.processed_by_agent2 = 1), 0)
+            FROM raw_events re
+            LEFT JOIN validation_results vr ON vr.event_id = re.id
+            GROUP BY 1, 2, 3, 4
+        """, [(resolution, resolution, resolution, page) for resolution in ROLLUP_RESOLUTIONS
+              for page in (None, ALL_PAGES)])
+    
+    # Backfill runs: one row per replay of the rules over history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rules_version TEXT NOT NULL,
+            start_id INTEGER,
+            end_id INTEGER,
+            since DATETIME,
+            until DATETIME,
+            chunk_size INTEGER,
+            status TEXT DEFAULT 'RUNNING',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            finished_at DATETIME
+        )
+    """)
+    
+    # Raw event ids are only unique within a shard, so backfill bookkeeping and
+    # output are keyed by shard ('' = main database)
+    # Id range of each shard covered by a run, fixed when the run is created
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_run_shards (
+            run_id INTEGER NOT NULL,
+            shard TEXT NOT NULL DEFAULT '',
+            start_id INTEGER NOT NULL,
+            end_id INTEGER NOT NULL,
+            PRIMARY KEY (run_id, shard),
+            FOREIGN KEY (run_id) REFERENCES backfill_runs(id)
+        )
+    """)
+    
+    # Completed id chunks per run and shard, committed together with their output
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            run_id INTEGER NOT NULL,
+            shard TEXT NOT NULL DEFAULT '',
+            chunk_start INTEGER NOT NULL,
+            chunk_end INTEGER NOT NULL,
+            rows_processed INTEGER,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, shard, chunk_start),
+            FOREIGN KEY (run_id) REFERENCES backfill_runs(id)
+        )
+    """)
+    
+    # Versioned backfill output, kept apart from the live agent tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_validation_results (
+            run_id INTEGER NOT NULL,
+            shard TEXT NOT NULL DEFAULT '',
+            event_id INTEGER NOT NULL,
+            session_id TEXT,
+            validation_status TEXT,
+            issues TEXT,
+            PRIMARY KEY (run_id, shard, event_id),
+            FOREIGN KEY (run_id) REFERENCES backfill_runs(id)
+        )
+    """)
+    
+    # Coded issues of backfilled validations (same codes as validation_issues)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_validation_issues (
+            run_id INTEGER NOT NULL,
+            shard TEXT NOT NULL DEFAULT '',
+            event_id INTEGER NOT NULL,
+            issue_code INTEGER NOT NULL,
+            detail TEXT,
+            PRIMARY KEY (run_id, shard, event_id, issue_code),
+            FOREIGN KEY (run_id) REFERENCES backfill_runs(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_backfill_validation_issues_code
+        ON backfill_validation_issues(run_id, issue_code)
+    """)
     
     cursor.execute("""
-        INSERT INTO raw_events (session_id, user_email, event_type, page_url, ip_address, consent_given, encrypt_email)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (session_id, user_email, event_type, page_url, ip_address, consent_given, encrypt_email))
+        CREATE TABLE IF NOT EXISTS backfill_redacted_sessions (
+            run_id INTEGER NOT NULL,
+            shard TEXT NOT NULL DEFAULT '',
+            event_id INTEGER NOT NULL,
+            session_id TEXT,
+            user_email_redacted TEXT,
+            ip_address_redacted TEXT,
+            redaction_log TEXT,
+            compliance_status TEXT,
+            PRIMARY KEY (run_id, shard, event_id),
+            FOREIGN KEY (run_id) REFERENCES backfill_runs(id)
+        )
+    """)
     
-    event_id = cursor.lastrowid
     conn.commit()
     conn.close()
+    
+    if shard is not None:
+        # Only now is the schema in place for concurrent writers
+        _ready_shards.add(shard)
+    else:
+        # Existing shards plus the one receiving writes now (today's, in day mode)
+        shards = sorted({name for name in list_shards() + [shard_for_session(None)] if name is not None})
+        for name in shards:
+            init_db(name)
+        print("✅ Database initialized successfully" + (f" ({len(shards)} shards)" if shards else ""))
+
+def scrub_redaction_log(entries: List[str]) -> List[str]:
+    """Remove original email/IP values quoted by older Agent 2 log entries"""
+    return [LEGACY_LOG_VALUE.sub(r'\1 → ', entry) for entry in entries]
+
+def _scrub_redaction_logs(cursor):
+    """Rewrite stored redaction logs without original values (before they are indexed)"""
+    updates = []
+    for row in cursor.execute("SELECT id, redaction_log FROM redacted_sessions WHERE redaction_log IS NOT NULL"):
+        entries = json.loads(row['redaction_log'])
+        scrubbed = scrub_redaction_log(entries)
+        if scrubbed != entries:
+            updates.append((json.dumps(scrubbed), row['id']))
+    cursor.executemany("UPDATE redacted_sessions SET redaction_log = ? WHERE id = ?", updates)
+
+def insert_event(session_id: str, user_email: str, event_type: str, 
+                 page_url: str, ip_address: str, consent_given: bool, encrypt_email: bool = False,
+                 event_key: Optional[str] = None) -> int:
+    """Insert a new clickstream event (returns the existing id for duplicate keys)"""
+    event_id, _ = insert_event_once(session_id, user_email, event_type, page_url,
+                                    ip_address, consent_given, encrypt_email, event_key)
     return event_id
 
-def get_unprocessed_events() -> List[Dict]:
+@profiled
+def insert_event_once(session_id: str, user_email: str, event_type: str, 
+                      page_url: str, ip_address: str, consent_given: bool, encrypt_email: bool = False,
+                      event_key: Optional[str] = None, process: Optional[ProcessEvent] = None) -> Tuple[int, bool]:
+    """
+    Idempotent insert keyed by a client event id or content fingerprint
+    Keys are unique per shard: with day sharding a retry that arrives after
+    UTC midnight lands in the next day's shard and is only caught while its
+    key is still in the in-memory filter.
+    With `process` (fused pipeline), new events are validated and redacted
+    inline and all outputs are committed in the same transaction.
+    Returns: (event_id, is_duplicate)
+    """
+    if event_key:
+        cached_id = dedup_filter.lookup(event_key)
+        if cached_id is not None:
+            return cached_id, True
+        maybe_seen = dedup_filter.might_contain(event_key)
+    
+    conn = get_connection(shard_for_session(session_id), create=True)
+    try:
+        cursor = conn.cursor()
+        
+        if event_key and maybe_seen:
+            cursor.execute("SELECT id FROM raw_events WHERE event_key = ?", (event_key,))
+            row = cursor.fetchone()
+            if row:
+                dedup_filter.record_db_hit()
+                dedup_filter.remember(event_key, row['id'])
+                return row['id'], True
+            dedup_filter.record_false_positive()
+        
+        # OR IGNORE covers keys inserted before this process started (empty filter)
+        cursor.execute("""
+            INSERT OR IGNORE INTO raw_events
+            (session_id, user_email, event_type, page_url, ip_address, consent_given, encrypt_email, event_key,
+             processed_by_agent1)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (session_id, user_email, event_type, page_url, ip_address, consent_given, encrypt_email, event_key,
+              process is not None))
+        
+        is_duplicate = cursor.rowcount == 0
+        if is_duplicate:
+            cursor.execute("SELECT id FROM raw_events WHERE event_key = ?", (event_key,))
+            event_id = cursor.fetchone()['id']
+            dedup_filter.record_db_hit()
+        else:
+            event_id = cursor.lastrowid
+            status = None
+            if process is not None:
+                status = _write_fused_outputs(cursor, EventRecord(
+                    event_id, session_id, user_email, event_type, page_url, ip_address, consent_given, encrypt_email
+                ), process)
+            _rollup_new_event(cursor, event_id, consent_given, status)
+        
+        conn.commit()
+    except Exception:
+        # e.g. process() raised: leave no half-written event behind
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    if event_key:
+        dedup_filter.remember(event_key, event_id)
+    return event_id, is_duplicate
+
+@profiled
+def insert_events_batch(events: List[Dict], process: Optional[ProcessEvent] = None) -> Dict:
+    """
+    Insert a batch of collector events, one transaction per shard
+    Events need session_id and event_type; event_key (string or number) makes
+    them idempotent. Malformed events are counted as rejected, never raised.
+    `process` fuses validation/redaction into the same transactions.
+    Returns: {'accepted', 'duplicates', 'rejected'} counts
+    """
+    counts = {'accepted': 0, 'duplicates': 0, 'rejected': 0}
+    by_shard = {}
+    for event in events:
+        try:
+            event = dict(event, event_key=normalize_event_key(event.get('event_key')))
+        except ValueError:
+            counts['rejected'] += 1
+            continue
+        if (not event.get('session_id') or not event.get('event_type')
+                or any(not isinstance(event.get(field), (str, type(None))) for field in BATCH_TEXT_FIELDS)):
+            counts['rejected'] += 1
+        elif event.get('event_key') and dedup_filter.lookup(event['event_key']) is not None:
+            counts['duplicates'] += 1
+        else:
+            by_shard.setdefault(shard_for_session(event['session_id']), []).append(event)
+    
+    for shard, shard_events in by_shard.items():
+        conn = get_connection(shard, create=True)
+        try:
+            cursor = conn.cursor()
+            remembered = []
+            
+            for event in shard_events:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO raw_events
+                    (session_id, user_email, event_type, page_url, ip_address, consent_given, encrypt_email, event_key,
+                     processed_by_agent1)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (event['session_id'], event.get('user_email'), event['event_type'], event.get('page_url'),
+                      event.get('ip_address'), bool(event.get('consent_given')), bool(event.get('encrypt_email')),
+                      event.get('event_key'), process is not None))
+                if cursor.rowcount == 0:
+                    counts['duplicates'] += 1
+                    dedup_filter.record_db_hit()
+                else:
+                    counts['accepted'] += 1
+                    event_id = cursor.lastrowid
+                    status = None
+                    if process is not None:
+                        status = _write_fused_outputs(cursor, EventRecord(
+                            event_id, event['session_id'], event.get('user_email'), event['event_type'],
+                            event.get('page_url'), event.get('ip_address'), bool(event.get('consent_given')),
+                            bool(event.get('encrypt_email'))
+                        ), process)
+                    _rollup_new_event(cursor, event_id, event.get('consent_given'), status)
+                    if event.get('event_key'):
+                        remembered.append((event['event_key'], event_id))
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        for event_key, event_id in remembered:
+            dedup_filter.remember(event_key, event_id)
+    
+    return counts
+
+def get_dedup_stats() -> Dict:
+    """Get duplicate filter counters for ingestion monitoring"""
+    return dedup_filter.stats()
+
+@profiled
+def get_unprocessed_events(shard: Optional[str] = None) -> List[EventRecord]:
     """Get events not yet processed by Agent 1"""
-    conn = get_connection()
+    conn = get_connection(shard)
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(EventRecord)
     
-    cursor.execute("""
-        SELECT * FROM raw_events 
+    cursor.execute(f"""
+        SELECT {EVENT_COLUMNS} FROM raw_events 
         WHERE processed_by_agent1 = 0
         ORDER BY timestamp ASC
     """)
     
-    events = [dict(row) for row in cursor.fetchall()]
+    events = cursor.fetchall()
     conn.close()
     return events
 
-def mark_event_processed(event_id: int):
+@profiled
+def mark_event_processed(event_id: int, shard: Optional[str] = None):
     """Mark event as processed by Agent 1"""
-    conn = get_connection()
+    conn = get_connection(shard)
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -120,39 +545,113 @@ def mark_event_processed(event_id: int):
     conn.commit()
     conn.close()
 
-def insert_validation_result(event_id: int, session_id: str, status: str, issues: List[str]):
-    """Insert Agent 1 validation result"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+def _bump_rollups(cursor, event_id: int, events: int = 0, consented: int = 0,
+                  validation_errors: int = 0, redactions: int = 0):
+    """
+    Add to the minute/hour rollups of an event's bucket and event_type, for its
+    page and for all pages (caller commits)
+    """
+    cursor.executemany("""
+        INSERT INTO event_rollups
+        (resolution, bucket, event_type, page_url, events, consented, validation_errors, redactions)
+        SELECT ?, CAST(strftime('%s', timestamp) AS INTEGER) / ? * ?, event_type, COALESCE(?, page_url, ''),
+               ?, ?, ?, ?
+        FROM raw_events WHERE id = ?
+        ON CONFLICT (resolution, bucket, event_type, page_url) DO UPDATE SET
+            events = events + excluded.events,
+            consented = consented + excluded.consented,
+            validation_errors = validation_errors + excluded.validation_errors,
+            redactions = redactions + excluded.redactions
+    """, [(resolution, resolution, resolution, page, events, consented, validation_errors, redactions, event_id)
+          for resolution in ROLLUP_RESOLUTIONS for page in (None, ALL_PAGES)])
+
+def _rollup_new_event(cursor, event_id: int, consent_given, status: Optional[str]):
+    """Rollups for a just-inserted event (status is set when the fused path processed it)"""
+    _bump_rollups(cursor, event_id, events=1, consented=int(bool(consent_given)),
+                  validation_errors=int(status not in (None, 'VALID')), redactions=int(status is not None))
+
+def _write_validation(cursor, event_id: int, session_id: str, status: str, issues: List[Issue],
+                      redacted: bool = False) -> int:
+    """INSERT a validation result and its coded issue rows (caller commits)"""
     cursor.execute("""
-        INSERT INTO validation_results (event_id, session_id, validation_status, issues)
-        VALUES (?, ?, ?, ?)
-    """, (event_id, session_id, status, json.dumps(issues)))
+        INSERT INTO validation_results (event_id, session_id, validation_status, issues, processed_by_agent2)
+        VALUES (?, ?, ?, ?, ?)
+    """, (event_id, session_id, status, json.dumps(render_issues(issues)), redacted))
     
+    validation_id = cursor.lastrowid
+    cursor.executemany("""
+        INSERT INTO validation_issues (validation_id, issue_code, detail)
+        VALUES (?, ?, ?)
+    """, [(validation_id, int(issue.code), issue.detail) for issue in issues])
+    return validation_id
+
+def _write_redaction(cursor, session_id: str, email_redacted: str, ip_redacted: str,
+                     event_count: int, redaction_log: List[str], compliance_status: str):
+    """INSERT a redacted session (caller commits)"""
+    cursor.execute("""
+        INSERT INTO redacted_sessions 
+        (session_id, user_email_redacted, ip_address_redacted, event_count, redaction_log, compliance_status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (session_id, email_redacted, ip_redacted, event_count, json.dumps(redaction_log), compliance_status))
+
+def _write_fused_outputs(cursor, event: EventRecord, process: ProcessEvent) -> str:
+    """Validate + redact a just-inserted event and write both outputs as already processed"""
+    status, issues, redaction = process(event)
+    _write_validation(cursor, event.id, event.session_id, status, issues, redacted=True)
+    _write_redaction(cursor, event.session_id, redaction.email_redacted, redaction.ip_redacted, 1,
+                     redaction.redaction_log, redaction.compliance_status)
+    return status
+
+@profiled
+def insert_validation_result(event_id: int, session_id: str, status: str, issues: List[Issue],
+                             shard: Optional[str] = None):
+    """Insert Agent 1 validation result (rendered messages + coded issue rows)"""
+    conn = get_connection(shard)
+    cursor = conn.cursor()
+    _write_validation(cursor, event_id, session_id, status, issues)
+    if status != 'VALID':
+        _bump_rollups(cursor, event_id, validation_errors=1)
     conn.commit()
     conn.close()
 
-def get_unredacted_sessions() -> List[Dict]:
+@profiled
+def get_unredacted_sessions(shard: Optional[str] = None) -> List[ValidationRecord]:
     """Get validation results not yet processed by Agent 2"""
-    conn = get_connection()
+    conn = get_connection(shard)
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(ValidationRecord)
     
-    cursor.execute("""
-        SELECT vr.*, re.user_email, re.ip_address, re.consent_given
+    cursor.execute(f"""
+        SELECT {VALIDATION_COLUMNS}
         FROM validation_results vr
         JOIN raw_events re ON vr.event_id = re.id
         WHERE vr.processed_by_agent2 = 0
         ORDER BY vr.timestamp ASC
     """)
     
-    sessions = [dict(row) for row in cursor.fetchall()]
+    sessions = cursor.fetchall()
     conn.close()
     return sessions
 
-def mark_validation_processed(validation_id: int):
+@profiled
+def has_pending_work(shard: Optional[str] = None) -> bool:
+    """True while Agent 1 or Agent 2 still has rows to process in a shard"""
+    conn = get_connection(shard)
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT EXISTS (SELECT 1 FROM raw_events WHERE processed_by_agent1 = 0)
+            OR EXISTS (SELECT 1 FROM validation_results WHERE processed_by_agent2 = 0)
+    """)
+    
+    pending = bool(cursor.fetchone()[0])
+    conn.close()
+    return pending
+
+@profiled
+def mark_validation_processed(validation_id: int, shard: Optional[str] = None):
     """Mark validation result as processed by Agent 2"""
-    conn = get_connection()
+    conn = get_connection(shard)
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -164,21 +663,20 @@ def mark_validation_processed(validation_id: int):
     conn.commit()
     conn.close()
 
+@profiled
 def insert_redacted_session(session_id: str, email_redacted: str, ip_redacted: str, 
-                            event_count: int, redaction_log: List[str], compliance_status: str):
-    """Insert Agent 2 redacted session"""
-    conn = get_connection()
+                            event_count: int, redaction_log: List[str], compliance_status: str,
+                            shard: Optional[str] = None, event_id: Optional[int] = None):
+    """Insert Agent 2 redacted session (event_id, when known, feeds the rollups)"""
+    conn = get_connection(shard)
     cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO redacted_sessions 
-        (session_id, user_email_redacted, ip_address_redacted, event_count, redaction_log, compliance_status)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (session_id, email_redacted, ip_redacted, event_count, json.dumps(redaction_log), compliance_status))
-    
+    _write_redaction(cursor, session_id, email_redacted, ip_redacted, event_count, redaction_log, compliance_status)
+    if event_id is not None:
+        _bump_rollups(cursor, event_id, redactions=1)
     conn.commit()
     conn.close()
 
+@profiled
 def insert_agent_insight(insight_type: str, insight_text: str, related_sessions: Optional[List[str]] = None):
     """Insert Agent 3 insight"""
     conn = get_connection()
@@ -192,9 +690,9 @@ def insert_agent_insight(insight_type: str, insight_text: str, related_sessions:
     conn.commit()
     conn.close()
 
-def get_summary_stats() -> Dict:
-    """Get aggregated statistics for Agent 3"""
-    conn = get_connection()
+def _shard_counts(shard: Optional[str]) -> Dict:
+    """Raw counters of one shard (summed by get_summary_stats)"""
+    conn = get_connection(shard)
     cursor = conn.cursor()
     
     # Total events
@@ -214,30 +712,100 @@ def get_summary_stats() -> Dict:
     issues_count = cursor.fetchone()['count']
     
     conn.close()
+    return Counter(total_events=total_events, consent_count=consent_count,
+                   redacted_count=redacted_count, issues_detected=issues_count)
+
+@profiled
+def get_summary_stats() -> Dict:
+    """Get aggregated statistics for Agent 3 (summed across shards)"""
+    totals = Counter()
+    for _, counts in fan_out(_shard_counts):
+        totals.update(counts)
+    
+    total_events = totals['total_events']
+    consent_count = totals['consent_count']
     
     return {
         'total_events': total_events,
         'consent_count': consent_count,
-        'redacted_count': redacted_count,
-        'issues_detected': issues_count,
+        'redacted_count': totals['redacted_count'],
+        'issues_detected': totals['issues_detected'],
         'consent_percentage': round((consent_count / total_events * 100) if total_events > 0 else 0, 1)
     }
 
-def get_recent_events(limit: int = 10) -> List[Dict]:
-    """Get recent events for dashboard"""
-    conn = get_connection()
+def _shard_issue_counts(shard: Optional[str]) -> Counter:
+    conn = get_connection(shard)
     cursor = conn.cursor()
     
     cursor.execute("""
+        SELECT issue_code, COUNT(*) as count
+        FROM validation_issues
+        GROUP BY issue_code
+    """)
+    
+    counts = Counter({row['issue_code']: row['count'] for row in cursor.fetchall()})
+    conn.close()
+    return counts
+
+@profiled
+def get_issue_counts() -> List[Dict]:
+    """Count Agent 1 issues by type (grouped scan of idx_validation_issues_code per shard)"""
+    totals = Counter()
+    for _, counts in fan_out(_shard_issue_counts):
+        totals.update(counts)
+    
+    return [
+        {'code': IssueCode(code).name, 'message': issue_label(IssueCode(code)), 'count': count}
+        for code, count in totals.most_common()
+    ]
+
+def _recent_rows(sql: str, limit: int) -> List[Dict]:
+    """Newest rows of a per-shard query, merged across shards by timestamp"""
+    def query(shard):
+        conn = get_connection(shard)
+        cursor = conn.cursor()
+        cursor.execute(sql, (limit,))
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        if shard is not None:
+            for row in rows:
+                row['shard'] = shard
+        return rows
+    
+    rows = [row for _, shard_rows in fan_out(query) for row in shard_rows]
+    rows.sort(key=lambda row: row['timestamp'] or '', reverse=True)
+    return rows[:limit]
+
+@profiled
+def get_recent_events(limit: int = 10) -> List[Dict]:
+    """Get recent events for dashboard"""
+    return _recent_rows("""
         SELECT * FROM raw_events 
         ORDER BY timestamp DESC 
         LIMIT ?
-    """, (limit,))
-    
-    events = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return events
+    """, limit)
+
+@profiled
+def get_recent_validation_results(limit: int = 10) -> List[Dict]:
+    """Get recent Agent 1 validation results with their event details"""
+    return _recent_rows("""
+        SELECT vr.*, re.session_id, re.event_type, re.page_url
+        FROM validation_results vr
+        JOIN raw_events re ON vr.event_id = re.id
+        ORDER BY vr.timestamp DESC
+        LIMIT ?
+    """, limit)
+
+@profiled
+def get_recent_redactions(limit: int = 10) -> List[Dict]:
+    """Get recent Agent 2 redacted sessions"""
+    return _recent_rows("""
+        SELECT * FROM redacted_sessions
+        ORDER BY timestamp DESC
+        LIMIT ?
+    """, limit)
 
+@profiled
 def get_recent_insights(limit: int = 5) -> List[Dict]:
     """Get recent Agent 3 insights"""
     conn = get_connection()
@@ -253,5 +821,344 @@ def get_recent_insights(limit: int = 5) -> List[Dict]:
     conn.close()
     return insights
 
+def _shard_rollups(shard: Optional[str], sql: str, params: list) -> List:
+    conn = get_connection(shard)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+@profiled
+def get_timeseries(start: int, end: int, step: int, metrics: Optional[List[str]] = None,
+                   event_type: Optional[str] = None, page_url: Optional[str] = None,
+                   group_by: Optional[str] = None) -> Dict:
+    """
+    Rollup counters summed into `step`-second buckets over [start, end) (epoch seconds)
+    Hour rollups are read when step is a whole number of hours, minute rollups otherwise,
+    so a 30-day chart touches at most 720 buckets per event_type/page. Unless a page
+    is filtered or grouped on, only the all-pages rows are read.
+    Returns: {'resolution', 'step', 'buckets': [epoch...], 'series': {group: {metric: [counts...]}}}
+    """
+    metrics = list(metrics or ROLLUP_METRICS)
+    if any(metric not in ROLLUP_METRICS for metric in metrics):
+        raise ValueError(f"metrics must be among {ROLLUP_METRICS}")
+    if group_by not in (None, 'event_type', 'page_url'):
+        raise ValueError("group_by must be 'event_type' or 'page_url'")
+    if step <= 0 or step % ROLLUP_RESOLUTIONS[0]:
+        raise ValueError(f"step must be a positive multiple of {ROLLUP_RESOLUTIONS[0]} seconds")
+    
+    resolution = max(r for r in ROLLUP_RESOLUTIONS if step % r == 0)
+    start = start // step * step
+    slots = max(0, -(-(end - start) // step))
+    
+    filters, params = ["resolution = ?", "bucket >= ?", "bucket < ?"], [start, step, resolution, start, end]
+    if event_type is not None:
+        filters.append("event_type = ?")
+        params.append(event_type)
+    if page_url is not None:
+        filters.append("page_url = ?")
+        params.append(page_url)
+    elif group_by == 'page_url':
+        filters.append("page_url != ?")
+        params.append(ALL_PAGES)
+    else:
+        filters.append("page_url = ?")
+        params.append(ALL_PAGES)
+    group = group_by or "'all'"
+    sums = ", ".join(f"SUM({metric})" for metric in metrics)
+    sql = f"""
+        SELECT (bucket - ?) / ? AS slot, {group} AS grp, {sums}
+        FROM event_rollups
+        WHERE {' AND '.join(filters)}
+        GROUP BY slot, grp
+    """
+    
+    series = {}
+    for _, rows in fan_out(lambda shard: _shard_rollups(shard, sql, params)):
+        for slot, grp, *values in rows:
+            columns = series.setdefault(grp, {metric: [0] * slots for metric in metrics})
+            for metric, value in zip(metrics, values):
+                columns[metric][slot] += value
+    
+    return {
+        'resolution': resolution,
+        'step': step,
+        'buckets': [start + i * step for i in range(slots)],
+        'series': series
+    }
+
+@profiled
+def create_backfill_run(rules_version: str, bounds: Dict[Optional[str], Tuple[int, int]],
+                        since: Optional[str], until: Optional[str], chunk_size: int) -> int:
+    """Register a new backfill run over (start_id, end_id) per shard (None = main database)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        INSERT INTO backfill_runs (rules_version, start_id, end_id, since, until, chunk_size)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (rules_version, min(lo for lo, _ in bounds.values()), max(hi for _, hi in bounds.values()),
+          since, until, chunk_size))
+    
+    run_id = cursor.lastrowid
+    cursor.executemany("""
+        INSERT INTO backfill_run_shards (run_id, shard, start_id, end_id)
+        VALUES (?, ?, ?, ?)
+    """, [(run_id, shard or '', start_id, end_id) for shard, (start_id, end_id) in bounds.items()])
+    
+    conn.commit()
+    conn.close()
+    return run_id
+
+@profiled
+def get_backfill_run(run_id: int) -> Optional[Dict]:
+    """Get a backfill run by id"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT * FROM backfill_runs WHERE id = ?", (run_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+@profiled
+def finish_backfill_run(run_id: int, status: str = 'COMPLETED'):
+    """Mark a backfill run as finished"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        UPDATE backfill_runs 
+        SET status = ?, finished_at = CURRENT_TIMESTAMP 
+        WHERE id = ?
+    """, (status, run_id))
+    
+    conn.commit()
+    conn.close()
+
+@profiled
+def get_backfill_run_shards(run_id: int) -> Dict[Optional[str], Tuple[int, int]]:
+    """Get the id range per shard (None = main database) covered by a run"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT shard, start_id, end_id FROM backfill_run_shards WHERE run_id = ? ORDER BY shard",
+                   (run_id,))
+    bounds = {row['shard'] or None: (row['start_id'], row['end_id']) for row in cursor.fetchall()}
+    conn.close()
+    return bounds
+
+@profiled
+def get_completed_chunks(run_id: int) -> set:
+    """Get (shard, start id) of chunks already checkpointed for a run"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT shard, chunk_start FROM backfill_checkpoints WHERE run_id = ?", (run_id,))
+    chunks = {(row['shard'] or None, row['chunk_start']) for row in cursor.fetchall()}
+    conn.close()
+    return chunks
+
+def time_range_clause(since: Optional[str], until: Optional[str]) -> Tuple[str, list]:
+    """Build an optional timestamp filter that can use idx_raw_events_timestamp"""
+    clause, params = "", []
+    if since:
+        clause += " AND timestamp >= ?"
+        params.append(since)
+    if until:
+        clause += " AND timestamp < ?"
+        params.append(until)
+    return clause, params
+
+@profiled
+def get_event_id_bounds(since: Optional[str] = None, until: Optional[str] = None,
+                        shard: Optional[str] = None) -> Tuple[Optional[int], Optional[int]]:
+    """Get (min_id, max_id) of a shard's raw events in an optional time range"""
+    conn = get_connection(shard)
+    cursor = conn.cursor()
+    
+    clause, params = time_range_clause(since, until)
+    cursor.execute(f"""
+        SELECT MIN(id) as min_id, MAX(id) as max_id FROM raw_events
+        WHERE 1 = 1{clause}
+    """, params)
+    
+    row = cursor.fetchone()
+    conn.close()
+    return row['min_id'], row['max_id']
+
+@profiled
+def get_events_in_range(start_id: int, end_id: int, since: Optional[str] = None,
+                        until: Optional[str] = None, shard: Optional[str] = None) -> List[EventRecord]:
+    """Get a shard's raw events with start_id <= id < end_id (primary key range scan)"""
+    conn = get_connection(shard)
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory(EventRecord)
+    
+    clause, params = time_range_clause(since, until)
+    cursor.execute(f"""
+        SELECT {EVENT_COLUMNS} FROM raw_events
+        WHERE id >= ? AND id < ?{clause}
+        ORDER BY id
+    """, [start_id, end_id, *params])
+    
+    events = cursor.fetchall()
+    conn.close()
+    return events
+
+@profiled
+def insert_backfill_chunk(run_id: int, shard: Optional[str], chunk_start: int, chunk_end: int,
+                          validations: List[tuple], redactions: List[tuple], issues: List[tuple]):
+    """
+    Write one chunk of backfill output and its checkpoint in a single transaction
+    (always in the main database; shard names the id space the chunk came from)
+    validations: (event_id, session_id, status, issues_json)
+    redactions: (event_id, session_id, email, ip, redaction_log_json, compliance_status)
+    issues: (event_id, issue_code, detail)
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.executemany("""
+        INSERT OR REPLACE INTO backfill_validation_results
+        (run_id, shard, event_id, session_id, validation_status, issues)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(run_id, shard or '', *row) for row in validations])
+    
+    cursor.executemany("""
+        INSERT OR REPLACE INTO backfill_redacted_sessions
+        (run_id, shard, event_id, session_id, user_email_redacted, ip_address_redacted, redaction_log, compliance_status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(run_id, shard or '', *row) for row in redactions])
+    
+    cursor.executemany("""
+        INSERT OR REPLACE INTO backfill_validation_issues (run_id, shard, event_id, issue_code, detail)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(run_id, shard or '', *row) for row in issues])
+    
+    cursor.execute("""
+        INSERT OR REPLACE INTO backfill_checkpoints (run_id, shard, chunk_start, chunk_end, rows_processed)
+        VALUES (?, ?, ?, ?, ?)
+    """, (run_id, shard or '', chunk_start, chunk_end, len(validations)))
+    
+    conn.commit()
+    conn.close()
+
+@profiled
+def get_backfill_issue_counts(run_id: int) -> List[Dict]:
+    """Count a backfill run's issues by type (grouped scan of idx_backfill_validation_issues_code)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT issue_code, COUNT(*) as count
+        FROM backfill_validation_issues
+        WHERE run_id = ?
+        GROUP BY issue_code
+        ORDER BY count DESC
+    """, (run_id,))
+    
+    counts = [
+        {'code': IssueCode(row['issue_code']).name, 'message': issue_label(IssueCode(row['issue_code'])),
+         'count': row['count']}
+        for row in cursor.fetchall()
+    ]
+    conn.close()
+    return counts
+
+def build_match_query(text: str, match_any: bool = False) -> Optional[str]:
+    """Turn free text into a safe FTS5 MATCH expression (quoted terms, trailing * = prefix)"""
+    terms = []
+    for word in re.findall(r'[\w@.*-]+', text):
+        prefix = word.endswith('*')
+        word = word.strip('*')
+        if word:
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    if not terms:
+        return None
+    return (" OR " if match_any else " ").join(terms)
+
+def encode_search_cursor(score: float, source: str, record_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, source, record_id]).encode()).decode()
+
+def decode_search_cursor(cursor_token: str) -> Tuple[float, str, int]:
+    try:
+        score, source, record_id = json.loads(base64.urlsafe_b64decode(cursor_token.encode()))
+        return float(score), str(source), int(record_id)
+    except (ValueError, TypeError):
+        # binascii.Error and JSONDecodeError are ValueErrors; wrong shapes raise either
+        raise ValueError("invalid cursor") from None
+
+@profiled
+def search_records(query: str, kinds: Optional[List[str]] = None, limit: int = 20,
+                   after: Optional[str] = None, match_any: bool = False) -> Dict:
+    """
+    Ranked full-text search over insights, validation issues and redaction logs
+    Results are ordered by (bm25 score, kind[@shard], id); `after` is the opaque
+    next_cursor of the previous page (keyset paging, no OFFSET scans).
+    """
+    kinds = kinds or list(SEARCH_INDEXES)
+    unknown = set(kinds) - set(SEARCH_INDEXES)
+    if unknown:
+        raise ValueError(f"Unknown search kinds: {sorted(unknown)}")
+    
+    match = build_match_query(query, match_any)
+    if not match:
+        return {'results': [], 'next_cursor': None}
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    last = decode_search_cursor(after) if after else None
+    
+    # Insights live in the main database; agent output tables in each shard
+    sources = [(kind, shard) for kind in kinds
+               for shard in ([None] if kind == 'insights' else list_shards())]
+    results = []
+    
+    for kind, shard in sources:
+        table, column, fts = SEARCH_INDEXES[kind]
+        source = kind if shard is None else f"{kind}@{shard}"
+        
+        # Resume strictly after the last (score, source, id) of the previous page
+        keyset, params = "", [match]
+        if last:
+            last_score, last_source, last_id = last
+            if source > last_source:
+                keyset, params = " WHERE score >= ?", params + [last_score]
+            elif source == last_source:
+                keyset, params = " WHERE score > ? OR (score = ? AND id > ?)", params + [last_score, last_score, last_id]
+            else:
+                keyset, params = " WHERE score > ?", params + [last_score]
+        
+        conn = get_connection(shard)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM (
+                SELECT src.id AS id, bm25({fts}) AS score,
+                       snippet({fts}, 0, '[', ']', '…', 12) AS snippet,
+                       src.timestamp AS timestamp
+                FROM {fts}
+                JOIN {table} src ON src.id = {fts}.rowid
+                WHERE {fts} MATCH ?
+            ){keyset}
+            ORDER BY score, id
+            LIMIT ?
+        """, params + [limit])
+        
+        for row in cursor.fetchall():
+            result = {'kind': kind, **dict(row), '_source': source}
+            if shard is not None:
+                result['shard'] = shard
+            results.append(result)
+        conn.close()
+    
+    results.sort(key=lambda r: (r['score'], r['_source'], r['id']))
+    page = results[:limit]
+    next_cursor = None
+    if len(page) == limit:
+        tail = page[-1]
+        next_cursor = encode_search_cursor(tail['score'], tail['_source'], tail['id'])
+    for result in page:
+        del result['_source']
+    return {'results': page, 'next_cursor': next_cursor}
+
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,122 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string keys.
+    Answers "definitely new" or "maybe seen" without touching SQLite.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Standard sizing: m = -n ln(p) / (ln 2)^2, k = (m / n) ln 2
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        """Derive k bit positions from one digest (Kirsch-Mitzenmacher double hashing)"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+class DuplicateFilter:
+    """
+    In-memory front for idempotent ingestion.
+    An LRU of recently seen event keys (key -> event id) sits in front of a
+    Bloom filter; only Bloom "maybe" answers fall back to a SQLite lookup.
+    The unique index on raw_events.event_key remains the source of truth.
+    """
+
+    def __init__(self, lru_size: int = 10_000, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.lru_size = lru_size
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.recent: "OrderedDict[str, int]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.lru_hits = 0
+        self.db_hits = 0
+        self.false_positives = 0
+        self.misses = 0
+
+    def lookup(self, key: str) -> Optional[int]:
+        """Return the cached event id for a recently seen key"""
+        with self.lock:
+            event_id = self.recent.get(key)
+            if event_id is not None:
+                self.recent.move_to_end(key)
+                self.lru_hits += 1
+            return event_id
+
+    def might_contain(self, key: str) -> bool:
+        """Bloom check; False means the key has definitely not been seen"""
+        with self.lock:
+            if key in self.bloom:
+                return True
+            self.misses += 1
+            return False
+
+    def remember(self, key: str, event_id: int):
+        """Record a key after it was inserted or found in the database"""
+        with self.lock:
+            self.bloom.add(key)
+            self.recent[key] = event_id
+            self.recent.move_to_end(key)
+            if len(self.recent) > self.lru_size:
+                self.recent.popitem(last=False)
+
+    def record_db_hit(self):
+        with self.lock:
+            self.db_hits += 1
+
+    def record_false_positive(self):
+        with self.lock:
+            self.false_positives += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'dedup_hits': self.lru_hits + self.db_hits,
+                'lru_hits': self.lru_hits,
+                'db_hits': self.db_hits,
+                'bloom_false_positives': self.false_positives,
+                'new_keys': self.misses + self.false_positives,
+                'lru_entries': len(self.recent),
+            }
+
+def normalize_event_key(value) -> Optional[str]:
+    """Client event id as a string key (None if absent); objects, lists and booleans are rejected"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError("event_id must be a string or number")
+    return str(value)
+
+# Fingerprints only match within one window, so a real repeat of the same event later is kept
+FINGERPRINT_WINDOW = 60
+
+def event_fingerprint(session_id: str, user_email: str, event_type: str, page_url: str,
+                      ip_address: str, consent_given: bool, encrypt_email: bool = False,
+                      now: Optional[float] = None, window: int = FINGERPRINT_WINDOW) -> str:
+    """
+    Content fingerprint for clients that cannot supply their own event id
+    Includes the `window`-second time bucket: identical events in the same bucket
+    are treated as retries (a retry that crosses a bucket boundary is not caught).
+    """
+    bucket = int((time.time() if now is None else now) // window)
+    payload = "\x1f".join(str(v) for v in (session_id, user_email, event_type, page_url,
+                                            ip_address, bool(consent_given), bool(encrypt_email), bucket))
+    return hashlib.sha256(payload.encode()).hexdigest()
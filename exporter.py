@@ -0,0 +1,133 @@
+"""
+Streaming bulk export of agent output tables.
+
+Rows are pulled from a SQLite cursor in fixed-size batches and encoded
+straight into NDJSON or CSV chunks (optionally gzip-compressed), so memory
+stays constant regardless of the time range exported.
+
+Usage:
+    python exporter.py redacted_sessions --since "2024-01-01" --format ndjson --gzip -o out.ndjson.gz
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from typing import Iterator, Optional
+
+import database
+from database import get_connection, time_range_clause
+from sharding import list_shards
+
+# Tables that may be exported and the columns written for each. Never raw_events
+# (it holds unredacted PII) and never redaction_log (it quotes original emails/IPs).
+EXPORT_COLUMNS = {
+    'redacted_sessions': ('id', 'session_id', 'user_email_redacted', 'ip_address_redacted',
+                          'event_count', 'compliance_status', 'timestamp'),
+    'validation_results': ('id', 'event_id', 'session_id', 'validation_status', 'issues',
+                           'timestamp', 'processed_by_agent2'),
+}
+EXPORT_TABLES = tuple(EXPORT_COLUMNS)
+EXPORT_FORMATS = ('ndjson', 'csv')
+BATCH_SIZE = 5000
+
+def iter_rows(table: str, since: Optional[str] = None, until: Optional[str] = None,
+              batch_size: int = BATCH_SIZE):
+    """
+    Yield (columns, batch) tuples from a server-side cursor in id order
+    (timestamp, id order when a time range is given)
+    With sharding enabled, shards are read one after another and each row is
+    prefixed with its shard name (ids are only unique within a shard).
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table: {table}")
+
+    clause, params = time_range_clause(since, until)
+    # Both orders are served by an index (timestamp index entries end in the rowid),
+    # so rows stream without a temp B-tree sort
+    order = "timestamp, id" if clause else "id"
+    for shard in list_shards():
+        conn = get_connection(shard)
+        conn.row_factory = None  # plain tuples, no per-row dict/Row objects
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(EXPORT_COLUMNS[table])} FROM {table} "
+                           f"WHERE 1 = 1{clause} ORDER BY {order}", params)
+            columns = [col[0] for col in cursor.description]
+            if shard is not None:
+                columns = ['shard'] + columns
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                if shard is not None:
+                    batch = [(shard,) + row for row in batch]
+                yield columns, batch
+        finally:
+            conn.close()
+
+def _encode_ndjson(columns, batch) -> bytes:
+    dumps = json.dumps
+    return "".join(dumps(dict(zip(columns, row))) + "\n" for row in batch).encode()
+
+def iter_export(table: str, fmt: str = 'ndjson', since: Optional[str] = None,
+                until: Optional[str] = None, compress: bool = False, level: int = 1) -> Iterator[bytes]:
+    """Yield encoded (and optionally gzip-compressed) byte chunks of an export"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    # wbits=31 produces a gzip container readable by gunzip / gzip.open
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+
+    for columns, batch in iter_rows(table, since, until):
+        if fmt == 'ndjson':
+            chunk = _encode_ndjson(columns, batch)
+        else:
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            writer.writerows(batch)
+            chunk = buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+
+    if compressor:
+        yield compressor.flush()
+
+def export_filename(table: str, fmt: str, compress: bool) -> str:
+    """Download filename for an export"""
+    return f"{table}.{fmt}" + (".gz" if compress else "")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream agent output tables to NDJSON/CSV")
+    parser.add_argument('table', choices=EXPORT_TABLES)
+    parser.add_argument('--db', default=database.DB_NAME, help="SQLite database file")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+    parser.add_argument('--since', help="Only rows with timestamp >= SINCE")
+    parser.add_argument('--until', help="Only rows with timestamp < UNTIL")
+    parser.add_argument('--gzip', action='store_true', help="gzip-compress the output")
+    parser.add_argument('--level', type=int, default=1, help="gzip level (1 = fastest)")
+    parser.add_argument('-o', '--output', help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    database.DB_NAME = args.db
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in iter_export(args.table, args.format, args.since, args.until, args.gzip, args.level):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
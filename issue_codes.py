@@ -0,0 +1,74 @@
+from enum import IntEnum
+from typing import List, NamedTuple, Optional
+
+class IssueCode(IntEnum):
+    """Compact Agent 1 issue codes (stored in validation_issues.issue_code)"""
+    MISSING_SESSION_ID = 1
+    MISSING_EVENT_TYPE = 2
+    MISSING_PAGE_URL = 3
+    NO_CONSENT = 4
+    UNENCRYPTED_EMAIL = 5
+    INVALID_EMAIL = 6
+    INVALID_IP = 7
+    LOCAL_IP = 8
+
+class Issue(NamedTuple):
+    """One validation finding; detail is optional context (never an email address)"""
+    code: IssueCode
+    detail: Optional[str] = None
+
+# Codes that make an event ERROR instead of VALID
+ERROR_CODES = frozenset({
+    IssueCode.MISSING_SESSION_ID,
+    IssueCode.MISSING_EVENT_TYPE,
+    IssueCode.MISSING_PAGE_URL,
+    IssueCode.NO_CONSENT,
+    IssueCode.UNENCRYPTED_EMAIL,
+})
+
+# Human-readable rendering; {detail} is filled from Issue.detail
+MESSAGES = {
+    IssueCode.MISSING_SESSION_ID: "Missing session_id",
+    IssueCode.MISSING_EVENT_TYPE: "Missing event_type",
+    IssueCode.MISSING_PAGE_URL: "Missing page_url",
+    IssueCode.NO_CONSENT: "COMPLIANCE VIOLATION: Event captured without user consent - only consented events are allowed",
+    IssueCode.UNENCRYPTED_EMAIL: "SECURITY VIOLATION: Unencrypted email detected - clickstream must only capture encrypted emails",
+    IssueCode.INVALID_EMAIL: "Invalid email format",
+    IssueCode.INVALID_IP: "Invalid IP format: {detail}",
+    IssueCode.LOCAL_IP: "Localhost/invalid IP detected: {detail}",
+}
+
+# Prefixes of the free-text messages stored before issue codes existed
+LEGACY_PREFIXES = {
+    "Missing session_id": IssueCode.MISSING_SESSION_ID,
+    "Missing event_type": IssueCode.MISSING_EVENT_TYPE,
+    "Missing page_url": IssueCode.MISSING_PAGE_URL,
+    "COMPLIANCE VIOLATION": IssueCode.NO_CONSENT,
+    "SECURITY VIOLATION": IssueCode.UNENCRYPTED_EMAIL,
+    "Invalid email format": IssueCode.INVALID_EMAIL,
+    "Invalid IP format: ": IssueCode.INVALID_IP,
+    "Localhost/invalid IP detected: ": IssueCode.LOCAL_IP,
+}
+
+def render_issue(issue: Issue) -> str:
+    """Human-readable message for an issue"""
+    return MESSAGES[issue.code].format(detail=issue.detail or "")
+
+def issue_label(code: IssueCode) -> str:
+    """Message for a code without per-event detail (for aggregates)"""
+    return MESSAGES[code].replace(": {detail}", "")
+
+def render_issues(issues: List[Issue]) -> List[str]:
+    return [render_issue(issue) for issue in issues]
+
+def validation_status(issues: List[Issue]) -> str:
+    """ERROR if any issue is blocking, otherwise VALID"""
+    return "ERROR" if any(issue.code in ERROR_CODES for issue in issues) else "VALID"
+
+def parse_legacy_issue(message: str) -> Optional[Issue]:
+    """Map a pre-code free-text message back to an Issue (emails are dropped)"""
+    for prefix, code in LEGACY_PREFIXES.items():
+        if message.startswith(prefix):
+            detail = message[len(prefix):] if prefix.endswith(": ") else None
+            return Issue(code, detail)
+    return None
@@ -0,0 +1,231 @@
+"""
+Opt-in instrumentation for database.py and the agents.
+
+Enable with CLICKSTREAM_PROFILE=1 (read once at import). When disabled,
+`profiled` returns functions unchanged and `connection_factory()` returns
+plain sqlite3.Connection, so nothing is wrapped and there is no overhead.
+
+When enabled:
+- every decorated helper records calls, total/max time and rows returned
+- every SQL statement is timed; statements slower than
+  CLICKSTREAM_SLOW_QUERY_MS (default 50) are logged with EXPLAIN QUERY PLAN
+- sample_stacks() captures folded stacks (flame-graph input) of agent threads
+"""
+import os
+import sys
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from functools import wraps
+from typing import Dict, List, Optional
+
+ENABLED = os.getenv('CLICKSTREAM_PROFILE', '').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('CLICKSTREAM_SLOW_QUERY_MS', '50'))
+
+_lock = threading.Lock()
+helper_stats: Dict[str, Dict] = {}
+query_stats: Dict[str, Dict] = {}
+slow_queries = deque(maxlen=100)
+
+def _record(table: Dict[str, Dict], key: str, elapsed_ms: float, rows: Optional[int]):
+    with _lock:
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0}
+        entry['calls'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        if rows:
+            entry['rows'] += rows
+
+def _row_count(result) -> Optional[int]:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict) and isinstance(result.get('results'), list):
+        return len(result['results'])
+    return None
+
+def profiled(func):
+    """Time a DB helper or agent method (identity when profiling is disabled)"""
+    if not ENABLED:
+        return func
+
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        _record(helper_stats, name, (time.perf_counter() - started) * 1000, _row_count(result))
+        return result
+
+    return wrapper
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement and explains slow ones
+    sqlite3 only steps to the first row in execute(); the remaining rows are
+    produced by fetch*/iteration, so that time is added to the statement, which
+    is recorded once its rows are exhausted (or the cursor moves on / closes).
+    """
+    _pending = None  # [sql, params, elapsed_ms, rows] of the statement being fetched
+
+    def _timed(self, method, sql, params):
+        self._finish()
+        started = time.perf_counter()
+        result = method(sql, params)
+        self._pending = [sql, params, (time.perf_counter() - started) * 1000, 0]
+        if self.description is None:
+            # No result rows (DML/DDL): the statement already ran to completion
+            self._pending[3] = max(self.rowcount, 0)
+            self._finish()
+        return result
+
+    def _fetched(self, started: float, rows: int, exhausted: bool):
+        pending = self._pending
+        if pending is None:
+            return
+        pending[2] += (time.perf_counter() - started) * 1000
+        pending[3] += rows
+        if exhausted:
+            self._finish()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, elapsed_ms, rows = pending
+        key = _normalize(sql)
+        _record(query_stats, key, elapsed_ms, rows or None)
+        if elapsed_ms >= SLOW_QUERY_MS:
+            self._log_slow(key, params, elapsed_ms)
+
+    def _log_slow(self, sql: str, params, elapsed_ms: float):
+        plan = []
+        if sql.split(" ", 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE'):
+            try:
+                explain = sqlite3.Cursor(self.connection)
+                first = params[0] if params and isinstance(params, list) and isinstance(params[0], (tuple, list)) else params
+                plan = [row[-1] for row in explain.execute(f"EXPLAIN QUERY PLAN {sql}", first or ())]
+            except sqlite3.Error as e:
+                plan = [f"(plan unavailable: {e})"]
+        with _lock:
+            slow_queries.append({'sql': sql, 'ms': round(elapsed_ms, 2), 'plan': plan, 'at': time.time()})
+        print(f"[Profiler] 🐢 Slow query ({elapsed_ms:.1f} ms): {sql[:200]}")
+        for step in plan:
+            print(f"           {step}")
+
+    def execute(self, sql, params=()):
+        return self._timed(super().execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        return self._timed(super().executemany, sql, seq_of_params)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are profiled"""
+
+    def cursor(self, factory=ProfiledCursor):
+        cursor = super().cursor(factory)
+        if isinstance(cursor, ProfiledCursor):
+            self._cursors().add(cursor)
+        return cursor
+
+    def _cursors(self) -> "weakref.WeakSet":
+        if not hasattr(self, '_open_cursors'):
+            self._open_cursors = weakref.WeakSet()
+        return self._open_cursors
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def close(self):
+        # Record statements whose last rows were never fetched (e.g. fetchone on COUNT(*))
+        for cursor in list(self._cursors()):
+            cursor._finish()
+        super().close()
+
+def connection_factory():
+    """sqlite3.connect factory for database.get_connection"""
+    return ProfiledConnection if ENABLED else sqlite3.Connection
+
+def get_stats(top: int = 20) -> Dict:
+    """Helper/query timings sorted by total time, plus recent slow queries"""
+    def ranked(table):
+        rows = [{'name': name, **entry, 'avg_ms': entry['total_ms'] / entry['calls']} for name, entry in table.items()]
+        rows.sort(key=lambda r: r['total_ms'], reverse=True)
+        return [{k: round(v, 3) if isinstance(v, float) else v for k, v in row.items()} for row in rows[:top]]
+
+    with _lock:
+        return {
+            'helpers': ranked(helper_stats),
+            'queries': ranked(query_stats),
+            'slow_queries': list(slow_queries),
+        }
+
+def sample_stacks(seconds: float, interval: float = 0.005, thread_prefix: str = 'agent') -> List[str]:
+    """
+    Sample stacks of matching threads for `seconds`
+    Returns folded stacks ("thread;module:function;... count"), the input
+    format of flamegraph.pl / speedscope.
+    """
+    me = threading.get_ident()
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, str(ident))
+            if ident == me or not name.startswith(thread_prefix):
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            counts[";".join([name] + stack[::-1])] += 1
+        time.sleep(interval)
+
+    return [f"{stack} {count}" for stack, count in counts.most_common()]
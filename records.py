@@ -0,0 +1,40 @@
+from typing import List, NamedTuple, Optional
+
+class EventRecord(NamedTuple):
+    """A raw_events row as read by Agent 1 and backfill (column order = SELECT order)"""
+    id: Optional[int]
+    session_id: Optional[str]
+    user_email: Optional[str]
+    event_type: Optional[str]
+    page_url: Optional[str]
+    ip_address: Optional[str]
+    consent_given: Optional[int]
+    encrypt_email: Optional[int]
+    timestamp: Optional[str] = None
+
+class ValidationRecord(NamedTuple):
+    """A validation_results row joined with its event's PII fields, as read by Agent 2"""
+    id: int
+    event_id: int
+    session_id: Optional[str]
+    validation_status: str
+    user_email: Optional[str]
+    ip_address: Optional[str]
+    consent_given: Optional[int]
+
+class RedactionRecord(NamedTuple):
+    """Agent 2 output for one session (unpacks like the old 4-tuple)"""
+    email_redacted: Optional[str]
+    ip_redacted: Optional[str]
+    redaction_log: List[str]
+    compliance_status: str
+
+# SELECT lists matching the record fields, qualified by table alias
+EVENT_COLUMNS = ", ".join(EventRecord._fields)
+VALIDATION_COLUMNS = ("vr.id, vr.event_id, vr.session_id, vr.validation_status, "
+                      "re.user_email, re.ip_address, re.consent_given")
+
+def row_factory(record_type):
+    """sqlite3 row_factory that builds record_type straight from the row tuple"""
+    make = record_type._make
+    return lambda cursor, row: make(row)
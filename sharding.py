@@ -0,0 +1,101 @@
+"""
+Shard routing for clickstream storage.
+
+Disabled by default: everything lives in database.DB_NAME. Set
+CLICKSTREAM_SHARD_MODE to spread raw_events and the agent output tables
+over several SQLite files, each with its own write lock:
+
+- hash: CLICKSTREAM_SHARDS files (default 4), routed by crc32(session_id)
+- day:  one file per UTC day; old days can be detached in one rename
+
+Agent 3 insights and backfill bookkeeping stay in the main database
+(backfill reads every shard and keys its output by shard).
+
+Usage:
+    python sharding.py list
+    python sharding.py detach --before 20240101
+"""
+import argparse
+import glob
+import os
+import sys
+import zlib
+from datetime import datetime, timezone
+from typing import List, Optional
+
+SHARD_MODE = os.getenv('CLICKSTREAM_SHARD_MODE', '').lower()
+SHARD_COUNT = int(os.getenv('CLICKSTREAM_SHARDS', '4'))
+SHARD_DIR = os.getenv('CLICKSTREAM_SHARD_DIR', 'shards')
+ARCHIVE_DIR = os.path.join(SHARD_DIR, 'archive')
+
+if SHARD_MODE not in ('', 'hash', 'day'):
+    raise ValueError(f"CLICKSTREAM_SHARD_MODE must be 'hash' or 'day', got {SHARD_MODE!r}")
+
+def sharding_enabled() -> bool:
+    return SHARD_MODE in ('hash', 'day')
+
+def shard_for_session(session_id: Optional[str], when: Optional[datetime] = None) -> Optional[str]:
+    """Shard that receives writes for a session (None = main database)"""
+    if SHARD_MODE == 'hash':
+        return f"s{zlib.crc32((session_id or '').encode()) % SHARD_COUNT:02d}"
+    if SHARD_MODE == 'day':
+        # Matches SQLite CURRENT_TIMESTAMP, which is UTC
+        return (when or datetime.now(timezone.utc)).strftime('%Y%m%d')
+    return None
+
+def shard_path(shard: str) -> str:
+    return os.path.join(SHARD_DIR, f"clickstream-{shard}.db")
+
+def list_shards() -> List[Optional[str]]:
+    """All live shards in a stable order ([None] when sharding is off)"""
+    if SHARD_MODE == 'hash':
+        return [f"s{i:02d}" for i in range(SHARD_COUNT)]
+    if SHARD_MODE == 'day':
+        names = (os.path.basename(p)[len("clickstream-"):-len(".db")]
+                 for p in glob.glob(os.path.join(SHARD_DIR, "clickstream-*.db")))
+        return sorted(name for name in names if len(name) == 8 and name.isdigit())
+    return [None]
+
+def detach_shard(shard: str) -> str:
+    """Move a day shard (and its WAL/SHM files) into the archive directory"""
+    if SHARD_MODE != 'day':
+        raise ValueError("Only day shards can be detached")
+    if shard == shard_for_session(None):
+        raise ValueError("Refusing to detach today's shard")
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    source = shard_path(shard)
+    target = os.path.join(ARCHIVE_DIR, os.path.basename(source))
+    os.replace(source, target)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(source + suffix):
+            os.replace(source + suffix, target + suffix)
+    return target
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and detach clickstream shards")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="List live shards")
+    detach = sub.add_parser('detach', help="Archive day shards older than a date")
+    detach.add_argument('--before', required=True, help="YYYYMMDD; shards strictly older are detached")
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for shard in list_shards():
+            print(shard or "(main database, sharding disabled)")
+        return 0
+
+    if SHARD_MODE != 'day':
+        parser.error("detach needs CLICKSTREAM_SHARD_MODE=day")
+    today = shard_for_session(None)
+    for shard in list_shards():
+        if shard >= args.before:
+            continue
+        if shard == today:
+            print(f"⏭️  Skipped {shard} (still receiving writes)")
+        else:
+            print(f"📦 Detached {shard} → {detach_shard(shard)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
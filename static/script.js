@@ -7,7 +7,131 @@ async function sha256(message) {
     return hashHex;
 }
 
+// Email hashes are cached for the page lifetime (one crypto.subtle call per address)
+const emailHashCache = new Map();
+
+function hashEmail(email) {
+    if (!emailHashCache.has(email)) {
+        emailHashCache.set(email, sha256(email));
+    }
+    return emailHashCache.get(email);
+}
+
+// Random event id; crypto.randomUUID() only exists in secure contexts (HTTPS or localhost)
+function newEventId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    bytes[6] = (bytes[6] & 0x0f) | 0x40;  // RFC 4122 version 4
+    bytes[8] = (bytes[8] & 0x3f) | 0x80;
+    const hex = Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+// Click Collector: buffers page views and clicks, flushes batches to /collect
+const collector = (() => {
+    const MAX_BATCH = 50;          // flush when this many events are buffered
+    const FLUSH_INTERVAL = 15000;  // ...or this many ms after the first buffered event
+    const ENDPOINT = '/collect';
+
+    // Storage access throws when it is blocked; keep an in-memory id so setup never aborts the script
+    let sessionId = null;
+    try {
+        sessionId = sessionStorage.getItem('collector_session_id');
+    } catch (err) {}
+    if (!sessionId) {
+        sessionId = 'web_' + newEventId().slice(0, 8);
+        try {
+            sessionStorage.setItem('collector_session_id', sessionId);
+        } catch (err) {}
+    }
+
+    let buffer = [];
+    let timer = null;
+
+    function capture(eventType, pageUrl) {
+        // Privacy-first: nothing is collected without consent
+        if (!document.getElementById('consent_given').checked) {
+            return;
+        }
+        buffer.push({
+            event_id: newEventId(),
+            session_id: sessionId,
+            event_type: eventType,
+            page_url: pageUrl || location.pathname,
+            consent_given: true
+        });
+        if (buffer.length >= MAX_BATCH) {
+            flush();
+        } else if (!timer) {
+            timer = setTimeout(flush, FLUSH_INTERVAL);
+        }
+    }
+
+    function take() {
+        clearTimeout(timer);
+        timer = null;
+        const batch = buffer;
+        buffer = [];
+        return JSON.stringify({ events: batch });
+    }
+
+    function send(url, body) {
+        // sendBeacon survives page unload; fall back to keepalive fetch if it is refused
+        if (!(navigator.sendBeacon && navigator.sendBeacon(url, body))) {
+            fetch(url, { method: 'POST', body: body, keepalive: true }).catch(() => {});
+        }
+    }
+
+    async function flush() {
+        if (buffer.length === 0) {
+            return;
+        }
+        const payload = take();
+        if ('CompressionStream' in window) {
+            const stream = new Blob([payload]).stream().pipeThrough(new CompressionStream('gzip'));
+            const compressed = await new Response(stream).blob();
+            send(ENDPOINT + '?encoding=gzip', new Blob([compressed], { type: 'application/octet-stream' }));
+        } else {
+            send(ENDPOINT, new Blob([payload], { type: 'application/json' }));
+        }
+    }
+
+    function flushNow() {
+        // Page is going away: no time for async compression
+        if (buffer.length > 0) {
+            send(ENDPOINT, new Blob([take()], { type: 'application/json' }));
+        }
+    }
+
+    document.addEventListener('click', (e) => {
+        const target = e.target.closest('button, a, [data-track]');
+        // Elements under data-no-track send their own events (the event form posts to /submit_event)
+        if (target && !target.closest('[data-no-track]')) {
+            const label = target.dataset.track || target.id || target.textContent.trim().slice(0, 40);
+            capture('click', location.pathname + '#' + label);
+        }
+    });
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') {
+            flushNow();
+        }
+    });
+    window.addEventListener('pagehide', flushNow);
+
+    return { capture, flush };
+})();
+
 // Event Form Submission
+// One id per form fill: resubmitting after an error reuses it, so a request that
+// reached the server before the error is not stored twice
+let pendingEventId = null;
+
+document.getElementById('eventForm').addEventListener('input', () => {
+    pendingEventId = null;  // edited after an error: this is a new event
+});
+
 document.getElementById('eventForm').addEventListener('submit', async (e) => {
     e.preventDefault();
 
@@ -16,10 +140,12 @@ document.getElementById('eventForm').addEventListener('submit', async (e) => {
 
     // If encrypt checkbox is checked, hash the email with SHA256
     if (encryptEmail && userEmail) {
-        userEmail = await sha256(userEmail);
+        userEmail = await hashEmail(userEmail);
     }
 
+    pendingEventId = pendingEventId || newEventId();
     const formData = {
+        event_id: pendingEventId,
         session_id: document.getElementById('session_id').value,
         user_email: userEmail,
         event_type: document.getElementById('event_type').value,
@@ -45,7 +171,8 @@ document.getElementById('eventForm').addEventListener('submit', async (e) => {
             feedback.className = 'feedback success';
             feedback.textContent = result.message;
 
-            // Clear form
+            // Clear form; the next fill gets a new id
+            pendingEventId = null;
             document.getElementById('eventForm').reset();
             document.getElementById('consent_given').checked = true;
 
@@ -316,6 +443,7 @@ setInterval(() => {
 
 // Initial Load
 window.addEventListener('load', () => {
+    collector.capture('page_view');
     loadRecentEvents();
     loadAgent1Output();
     loadAgent2Output();
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Modules live at the repository root (no package); make them importable from tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh unsharded database (and empty duplicate filter) in a temp directory"""
+    import database
+    import sharding
+    from dedup import DuplicateFilter
+
+    monkeypatch.chdir(tmp_path)  # shards/ is relative to the working directory
+    monkeypatch.setattr(sharding, 'SHARD_MODE', '')
+    monkeypatch.setattr(database, 'DB_NAME', str(tmp_path / 'clickstream.db'))
+    monkeypatch.setattr(database, 'dedup_filter', DuplicateFilter(capacity=10_000))
+    monkeypatch.setattr(database, '_ready_shards', set())
+    database.init_db()
+    return database
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from agents.agent3_insights import Agent3Insights
+from agents.insight_scheduler import InsightScheduler
+from test_insight_scheduler import FakeClock, StatsFeed
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Agent 3 in mock mode (no API key) with a fake-clock scheduler"""
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    clock = FakeClock()
+    return Agent3Insights(api_key=None, scheduler=InsightScheduler(clock=clock)), clock
+
+def run_ticks(agent, clock, feed, rng, ticks, **noise):
+    """The decision part of Agent3Insights.run(), one 10 s poll per tick, without the DB"""
+    insights = []
+    for _ in range(ticks):
+        clock.advance(10)
+        stats = feed.noisy_tick(rng, **noise)
+        if agent.should_generate_insight(stats) and stats['total_events'] > 0:
+            insights.append((agent.scheduler.last_reason, agent.generate_insight(stats)))
+    return insights
+
+def test_mock_mode_never_builds_a_client(agent):
+    agent3, _ = agent
+    assert agent3.llm_available is False
+    assert agent3.client is None
+
+def test_mock_insight_is_deterministic_and_charges_the_budget(agent):
+    agent3, _ = agent
+    stats = StatsFeed().tick(10, issues=3, consents=8)
+    before = agent3.scheduler.token_budget.level()
+
+    insight = agent3.generate_insight(stats)
+    assert insight == agent3.generate_insight(stats)
+    assert "3 data quality issues" in insight
+    assert agent3.scheduler.token_budget.level() == pytest.approx(before - 2 * (len(insight) // 4))
+
+def test_steady_traffic_produces_only_the_first_insight(agent):
+    agent3, clock = agent
+    insights = run_ticks(agent3, clock, StatsFeed(), random.Random(1), 360)
+
+    assert [reason for reason, _ in insights] == ["first snapshot"]
+
+def test_error_spike_produces_one_coalesced_insight(agent):
+    agent3, clock = agent
+    feed, rng = StatsFeed(), random.Random(2)
+    run_ticks(agent3, clock, feed, rng, 200)
+
+    insights = run_ticks(agent3, clock, feed, rng, 5, error_rate=0.95)
+    assert len(insights) == 1
+    assert "error rate" in insights[0][0]
+    assert "issues detected" in insights[0][1]
+
+def test_mock_answers_use_current_stats(agent):
+    agent3, _ = agent
+    stats = StatsFeed().tick(10, issues=3, consents=8)
+
+    assert "80.0%" in agent3.answer_question("What is the consent rate?", stats, use_retrieval=False)
+    assert "3 data quality issues" in agent3.answer_question("Any issues?", stats, use_retrieval=False)
@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+import backfill
+
+def add_events(db, count):
+    for i in range(count):
+        db.insert_event(f"sess_{i}", f"user{i}@example.com" if i % 4 else "not-an-email",
+                        "click", "/home", f"10.0.{i}.1", consent_given=i % 3 != 0)
+
+def run_main(db, *args):
+    return backfill.main(['--db', db.DB_NAME, '--workers', '1', '--chunk-size', '10', *args])
+
+def query(db, sql, *params):
+    conn = sqlite3.connect(db.DB_NAME)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def test_plan_chunks_covers_the_range_and_skips_checkpointed_chunks():
+    assert backfill.plan_chunks(1, 25, 10, set()) == [(1, 11), (11, 21), (21, 26)]
+    assert backfill.plan_chunks(1, 25, 10, {11}) == [(1, 11), (21, 26)]
+    assert backfill.plan_chunks(5, 5, 10, set()) == [(5, 6)]
+
+def test_backfill_writes_every_event_once_with_checkpoints(db):
+    add_events(db, 25)
+    assert run_main(db, '--version', 'v1') == 0
+
+    assert query(db, "SELECT COUNT(*), COUNT(DISTINCT event_id) FROM backfill_validation_results") == [(25, 25)]
+    assert query(db, "SELECT COUNT(*) FROM backfill_redacted_sessions") == [(25,)]
+    assert query(db, "SELECT chunk_start, chunk_end, rows_processed FROM backfill_checkpoints ORDER BY 1") == [
+        (1, 11, 10), (11, 21, 10), (21, 26, 5)]
+    assert db.get_backfill_run(1)['status'] == 'COMPLETED'
+    # Live agent tables are untouched
+    assert query(db, "SELECT COUNT(*) FROM validation_results") == [(0,)]
+
+def test_backfill_writes_coded_issue_rows(db):
+    add_events(db, 25)
+    run_main(db, '--version', 'v1')
+
+    # Every 3rd event has no consent, every 4th an invalid email (ids are 1-based)
+    no_consent = sum(1 for i in range(25) if i % 3 == 0)
+    invalid_email = sum(1 for i in range(25) if i % 4 == 0)
+    counts = {row['code']: row['count'] for row in db.get_backfill_issue_counts(1)}
+    assert counts['NO_CONSENT'] == no_consent
+    assert counts['INVALID_EMAIL'] == invalid_email
+    assert query(db, "SELECT COUNT(*) FROM backfill_validation_issues WHERE issue_code = 4 AND event_id = 1") == [(1,)]
+
+def test_resume_processes_only_unfinished_chunks(db, capsys):
+    add_events(db, 25)
+    run_main(db, '--version', 'v1')
+
+    # Simulate a run interrupted before its middle chunk was committed
+    conn = sqlite3.connect(db.DB_NAME)
+    conn.execute("DELETE FROM backfill_checkpoints WHERE chunk_start = 11")
+    conn.execute("DELETE FROM backfill_validation_results WHERE event_id >= 11 AND event_id < 21")
+    conn.execute("DELETE FROM backfill_redacted_sessions WHERE event_id >= 11 AND event_id < 21")
+    conn.execute("UPDATE backfill_runs SET status = 'RUNNING'")
+    conn.commit()
+    conn.close()
+    capsys.readouterr()
+
+    assert run_main(db, '--resume', '1') == 0
+    assert "1 chunks pending" in capsys.readouterr().out
+    assert query(db, "SELECT COUNT(*) FROM backfill_validation_results") == [(25,)]
+    assert db.get_completed_chunks(1) == {(None, 1), (None, 11), (None, 21)}
+    assert db.get_backfill_run(1)['status'] == 'COMPLETED'
+
+def test_id_bounds_limit_the_run(db):
+    add_events(db, 25)
+    run_main(db, '--start-id', '5', '--end-id', '14')
+
+    assert query(db, "SELECT MIN(event_id), MAX(event_id), COUNT(*) FROM backfill_validation_results") == [(5, 14, 10)]
+
+def test_empty_range_creates_no_run(db, capsys):
+    assert run_main(db) == 0
+    assert "No events" in capsys.readouterr().out
+    assert db.get_backfill_run(1) is None
+
+def test_unknown_run_exits(db):
+    with pytest.raises(SystemExit):
+        run_main(db, '--resume', '99')
@@ -0,0 +1,30 @@
+import gzip
+import json
+
+import pytest
+
+@pytest.fixture
+def client(db, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'FUSED_PIPELINE', False)
+    return app.app.test_client()
+
+def event(event_id, **fields):
+    return dict(event_id=event_id, session_id='web_1', event_type='click', page_url='/', consent_given=True, **fields)
+
+def test_batch_counts_accepted_and_duplicates(client):
+    response = client.post('/collect', json={'events': [event('e1'), event('e2'), event('e1')]})
+    assert response.get_json() == {'success': True, 'accepted': 2, 'duplicates': 1, 'rejected': 0}
+
+def test_non_object_entries_are_rejected_not_dropped(client):
+    response = client.post('/collect', json={'events': [event('e1'), 'e2', 42, None, ['e3']]})
+    assert response.get_json() == {'success': True, 'accepted': 1, 'duplicates': 0, 'rejected': 4}
+
+def test_gzip_batches_are_accepted(client):
+    body = gzip.compress(json.dumps({'events': [event('e1')]}).encode())
+    response = client.post('/collect?encoding=gzip', data=body, content_type='application/octet-stream')
+    assert response.get_json()['accepted'] == 1
+
+def test_oversized_batches_are_refused(client):
+    response = client.post('/collect', json={'events': [event(f"e{i}") for i in range(501)]})
+    assert response.status_code == 400
@@ -0,0 +1,29 @@
+import pytest
+
+from dedup import DuplicateFilter, event_fingerprint, normalize_event_key
+
+EVENT = dict(session_id='web_1', user_email='a@example.com', event_type='click', page_url='/',
+             ip_address='10.0.0.1', consent_given=True)
+
+@pytest.mark.parametrize('value, key', [(None, None), ('', None), ('e1', 'e1'), (42, '42'), (1.5, '1.5')])
+def test_normalize_event_key(value, key):
+    assert normalize_event_key(value) == key
+
+@pytest.mark.parametrize('value', [True, {'id': 1}, [1]])
+def test_normalize_event_key_rejects_non_scalars(value):
+    with pytest.raises(ValueError):
+        normalize_event_key(value)
+
+def test_fingerprint_matches_retries_within_the_window():
+    assert event_fingerprint(**EVENT, now=120.0) == event_fingerprint(**EVENT, now=179.9)
+
+def test_fingerprint_keeps_later_repeats_of_the_same_event():
+    assert event_fingerprint(**EVENT, now=120.0) != event_fingerprint(**EVENT, now=180.0)
+    assert event_fingerprint(**EVENT, now=120.0) != event_fingerprint(**dict(EVENT, page_url='/x'), now=120.0)
+
+def test_filter_remembers_keys():
+    dedup = DuplicateFilter(lru_size=2, capacity=1000)
+    assert dedup.lookup('e1') is None
+    dedup.remember('e1', 7)
+    assert dedup.lookup('e1') == 7
+    assert dedup.might_contain('e1')
@@ -0,0 +1,48 @@
+import gzip
+import json
+
+import pytest
+
+import exporter
+from agents.agent1_validator import Agent1Validator
+from agents.agent2_redactor import Agent2Redactor
+
+EMAIL, IP = "alice@example.com", "10.1.2.3"
+
+@pytest.fixture
+def redacted(db):
+    """One event run through Agent 1 and Agent 2, as the polling agents would"""
+    event_id = db.insert_event("sess_1", EMAIL, "click", "/home", IP, consent_given=True)
+    event = db.get_unprocessed_events()[0]
+    status, issues = Agent1Validator().validate_event(event)
+    db.insert_validation_result(event_id, "sess_1", status, issues)
+    redaction = Agent2Redactor().apply_redaction(event)
+    db.insert_redacted_session("sess_1", redaction.email_redacted, redaction.ip_redacted, 1,
+                               redaction.redaction_log, redaction.compliance_status, event_id=event_id)
+    return db
+
+def export(table, fmt, compress=False):
+    data = b"".join(exporter.iter_export(table, fmt, compress=compress))
+    return (gzip.decompress(data) if compress else data).decode()
+
+@pytest.mark.parametrize('table', exporter.EXPORT_TABLES)
+@pytest.mark.parametrize('fmt', exporter.EXPORT_FORMATS)
+def test_export_never_contains_original_email_or_ip(redacted, table, fmt):
+    output = export(table, fmt, compress=True)
+
+    assert "sess_1" in output
+    assert EMAIL not in output
+    assert IP not in output
+
+def test_export_writes_only_the_allowed_columns(redacted):
+    row = json.loads(export('redacted_sessions', 'ndjson'))
+    assert tuple(row) == exporter.EXPORT_COLUMNS['redacted_sessions']
+    assert row['ip_address_redacted'] == "10.1.*.*"
+
+def test_csv_header_matches_columns(redacted):
+    header = export('validation_results', 'csv').splitlines()[0]
+    assert header.split(',') == list(exporter.EXPORT_COLUMNS['validation_results'])
+
+def test_unknown_table_is_rejected(db):
+    with pytest.raises(ValueError):
+        list(exporter.iter_rows('raw_events'))
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+EVENT = dict(session_id='web_1', user_email='a@example.com', event_type='click', page_url='/',
+             ip_address='10.0.0.1', consent_given=True)
+
+TABLES = ('raw_events', 'validation_results', 'validation_issues', 'redacted_sessions', 'event_rollups')
+
+@pytest.fixture
+def pipeline(db):
+    from agents.fused_pipeline import FusedPipeline
+    return FusedPipeline()
+
+def row_counts(db):
+    conn = db.get_connection()
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+    conn.close()
+    return counts
+
+def failing_after(pipeline, calls):
+    """process() that works for `calls` events, then raises"""
+    seen = []
+    def process(event):
+        if len(seen) == calls:
+            raise RuntimeError("redaction failed")
+        seen.append(event.id)
+        return pipeline.process(event)
+    return process
+
+def test_fused_insert_writes_every_output(db, pipeline):
+    event_id, duplicate = pipeline.submit(event_key='e1', **EVENT)
+    assert not duplicate
+    counts = row_counts(db)
+    assert counts['raw_events'] == counts['validation_results'] == counts['redacted_sessions'] == 1
+    assert pipeline.redactor.pii_redacted == 2
+
+def test_failed_process_rolls_back_the_event(db, pipeline):
+    with pytest.raises(RuntimeError):
+        db.insert_event_once(event_key='e1', process=failing_after(pipeline, 0), **EVENT)
+    assert set(row_counts(db).values()) == {0}
+    assert db.dedup_filter.lookup('e1') is None
+
+def test_failed_process_rolls_back_the_whole_batch(db, pipeline):
+    events = [dict(EVENT, event_key=f"e{i}") for i in range(3)]
+    with pytest.raises(RuntimeError):
+        db.insert_events_batch(events, process=failing_after(pipeline, 2))
+    assert set(row_counts(db).values()) == {0}
+    assert db.dedup_filter.lookup('e0') is None
+
+def test_pii_count_is_exact_under_concurrent_requests(db, pipeline):
+    def submit(worker):
+        for i in range(25):
+            pipeline.submit(event_key=f"w{worker}-{i}", **EVENT)
+    threads = [threading.Thread(target=submit, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pipeline.redactor.sessions_processed == 100
+    assert pipeline.redactor.pii_redacted == 200
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def app_module(db, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'agent_threads', {})
+    monkeypatch.setattr(app, 'shard_agents', {'agent1': {}, 'agent2': {}})
+    monkeypatch.setattr(app, 'agent3', None)
+    return app
+
+class Heartbeat:
+    def __init__(self, last_heartbeat):
+        self.last_heartbeat = last_heartbeat
+
+def register(app, name, agent, alive=True):
+    thread = threading.Thread(target=lambda: None)
+    if alive:
+        thread.is_alive = lambda: True
+    app.agent_threads[(name, None)] = thread
+    if name == 'agent3':
+        app.agent3 = agent
+    else:
+        app.shard_agents[name][None] = agent
+
+def test_readiness_does_not_wait_for_a_slow_llm_call(app_module):
+    now = time.time()
+    register(app_module, 'agent1', Heartbeat(now))
+    register(app_module, 'agent2', Heartbeat(now))
+    register(app_module, 'agent3', Heartbeat(now - 300))  # blocked in an LLM request
+
+    response = app_module.app.test_client().get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['agents']['agent3'] == 'stalled'
+
+def test_readiness_requires_the_ingest_agents(app_module):
+    register(app_module, 'agent1', Heartbeat(time.time()))
+    register(app_module, 'agent2', Heartbeat(None))
+
+    response = app_module.app.test_client().get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['agents']['agent2'] == 'starting'
+
+def test_dotenv_settings_apply_before_modules_read_them(tmp_path):
+    """Settings from .env reach modules that read CLICKSTREAM_* at import time"""
+    (tmp_path / '.env').write_text("CLICKSTREAM_SHARD_MODE=hash\nCLICKSTREAM_FUSED=1\n")
+    env = {key: value for key, value in os.environ.items() if not key.startswith('CLICKSTREAM_')}
+    env['PYTHONPATH'] = ROOT
+    result = subprocess.run(
+        [sys.executable, "-c", "import app, sharding; print(sharding.SHARD_MODE, app.FUSED_PIPELINE)"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ['hash', 'True']
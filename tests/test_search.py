@@ -0,0 +1,96 @@
+import json
+import sqlite3
+
+import pytest
+
+from agents.agent2_redactor import Agent2Redactor
+
+EMAIL, IP = "alice@example.com", "10.1.2.3"
+
+@pytest.fixture
+def client(db):
+    import app
+    return app.app.test_client()
+
+def add_insights(db, count):
+    for i in range(count):
+        db.insert_agent_insight("REAL_TIME", f"checkout latency insight number {i}")
+
+def add_redacted_session(db, redaction_log=None):
+    event_id = db.insert_event("sess_1", EMAIL, "click", "/home", IP, consent_given=True)
+    redaction = Agent2Redactor().apply_redaction(db.get_unprocessed_events()[0])
+    db.insert_redacted_session("sess_1", redaction.email_redacted, redaction.ip_redacted, 1,
+                               redaction_log or redaction.redaction_log, redaction.compliance_status,
+                               event_id=event_id)
+
+def test_keyset_paging_returns_every_match_once_in_rank_order(db):
+    add_insights(db, 7)
+    pages, cursor = [], None
+    while True:
+        page = db.search_records("checkout", limit=3, after=cursor)
+        pages.append(page['results'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    results = [r for page in pages for r in page]
+    assert sorted(r['id'] for r in results) == list(range(1, 8))
+    assert [(r['score'], r['id']) for r in results] == sorted((r['score'], r['id']) for r in results)
+
+def test_page_boundary_on_last_result_ends_with_an_empty_page(db):
+    add_insights(db, 4)
+    first = db.search_records("checkout", limit=4)
+    assert len(first['results']) == 4
+    assert db.search_records("checkout", limit=4, after=first['next_cursor']) == {'results': [], 'next_cursor': None}
+
+@pytest.mark.parametrize('cursor', ["not-base64!", "bm90IGpzb24=", "WzEsIDJd"])
+def test_malformed_cursor_is_a_value_error(db, cursor):
+    with pytest.raises(ValueError, match="invalid cursor"):
+        db.search_records("checkout", after=cursor)
+
+@pytest.mark.parametrize('query', [
+    "q=",
+    "q=checkout&limit=abc",
+    "q=checkout&cursor=garbage",
+    "q=checkout&kinds=raw_events",
+])
+def test_search_endpoint_rejects_bad_arguments_with_400(client, query):
+    response = client.get(f"/api/search?{query}")
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+@pytest.mark.parametrize('limit, expected', [("0", 1), ("-5", 1), ("1000", 7)])
+def test_search_endpoint_clamps_limit(client, db, limit, expected):
+    add_insights(db, 7)
+    response = client.get(f"/api/search?q=checkout&limit={limit}")
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == expected
+
+def test_redaction_logs_do_not_find_original_values(db):
+    add_redacted_session(db)
+
+    assert db.search_records(EMAIL, kinds=['redaction_logs'])['results'] == []
+    assert db.search_records(IP, kinds=['redaction_logs'])['results'] == []
+    [result] = db.search_records("generalized", kinds=['redaction_logs'])['results']
+    assert IP not in result['snippet']
+
+def test_legacy_logs_are_scrubbed_before_indexing(db):
+    add_redacted_session(db, [f"Email encrypted with SHA256: {EMAIL} → ff8d9819fc0e12bf...",
+                              f"IP generalized: {IP} → 10.1.*.*"])
+    # A database from before full-text search: no FTS table or triggers yet
+    conn = sqlite3.connect(db.DB_NAME)
+    conn.executescript("""
+        DROP TRIGGER redaction_logs_fts_ai; DROP TRIGGER redaction_logs_fts_ad; DROP TRIGGER redaction_logs_fts_au;
+        DROP TABLE redaction_logs_fts;
+    """)
+    conn.close()
+
+    db.init_db()
+
+    conn = sqlite3.connect(db.DB_NAME)
+    [(log,)] = conn.execute("SELECT redaction_log FROM redacted_sessions").fetchall()
+    conn.close()
+    assert json.loads(log) == ["Email encrypted with SHA256 → ff8d9819fc0e12bf...", "IP generalized → 10.1.*.*"]
+    assert db.search_records(EMAIL, kinds=['redaction_logs'])['results'] == []
+    assert len(db.search_records("generalized", kinds=['redaction_logs'])['results']) == 1
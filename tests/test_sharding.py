@@ -0,0 +1,91 @@
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+import sharding
+from dedup import DuplicateFilter
+
+EVENT = dict(user_email='a@example.com', event_type='click', page_url='/',
+             ip_address='10.0.0.1', consent_given=True)
+
+@pytest.fixture
+def sharded(db, monkeypatch):
+    """Switch the temp database to a shard mode: sharded('hash') / sharded('day')"""
+    def use(mode, count=4):
+        monkeypatch.setattr(sharding, 'SHARD_MODE', mode)
+        monkeypatch.setattr(sharding, 'SHARD_COUNT', count)
+        return db
+    return use
+
+def test_hash_routing_is_stable_and_spreads_sessions(sharded):
+    sharded('hash')
+    routes = {f"web_{i}": sharding.shard_for_session(f"web_{i}") for i in range(50)}
+    assert routes == {session: sharding.shard_for_session(session) for session in routes}
+    assert set(routes.values()) == set(sharding.list_shards())
+
+def test_day_routing_uses_the_utc_date(sharded):
+    sharded('day')
+    assert sharding.shard_for_session('web_1', datetime(2024, 1, 2, 23, 59, tzinfo=timezone.utc)) == '20240102'
+
+def test_fan_out_merges_every_shard(sharded):
+    db = sharded('hash')
+    for i in range(20):
+        db.insert_event_once(f"web_{i}", **EVENT)
+
+    assert all(os.path.exists(sharding.shard_path(shard)) for shard in sharding.list_shards())
+    assert db.get_summary_stats()['total_events'] == 20
+    assert len(db.get_recent_events(limit=50)) == 20
+
+def test_shard_catches_retries_the_filter_has_forgotten(sharded, monkeypatch):
+    db = sharded('hash')
+    event_id, duplicate = db.insert_event_once('web_1', **EVENT, event_key='e1')
+    assert not duplicate
+
+    monkeypatch.setattr(db, 'dedup_filter', DuplicateFilter(capacity=10_000))  # as after a restart
+    assert db.insert_event_once('web_1', **EVENT, event_key='e1') == (event_id, True)
+
+def test_detach_archives_past_days_only(sharded, capsys):
+    db = sharded('day')
+    today = sharding.shard_for_session(None)
+    for shard in ('20240101', '20240102', today):
+        db.init_db(shard)
+
+    assert sharding.main(['detach', '--before', '99999999']) == 0
+    assert sharding.list_shards() == [today]
+    assert sorted(os.listdir(sharding.ARCHIVE_DIR)) == ['clickstream-20240101.db', 'clickstream-20240102.db']
+    assert "Skipped" in capsys.readouterr().out
+
+def test_detach_refuses_outside_day_mode(sharded):
+    sharded('hash')
+    with pytest.raises(ValueError):
+        sharding.detach_shard('s00')
+    with pytest.raises(SystemExit):
+        sharding.main(['detach', '--before', '20240101'])
+
+def test_supervisor_retires_drained_past_days(sharded, monkeypatch):
+    db = sharded('day')
+    import app
+    today = sharding.shard_for_session(None)
+    for shard in ('20240101', '20240102', today):
+        db.init_db(shard)
+    conn = db.get_connection('20240102')
+    conn.execute("INSERT INTO raw_events (session_id, event_type) VALUES ('web_1', 'click')")
+    conn.commit()
+    conn.close()
+
+    started = []
+    monkeypatch.setattr(app, 'agent_threads', {})
+    monkeypatch.setattr(app, 'start_shard_agents',
+                        lambda shard: started.append(shard) or app.agent_threads.update({('agent1', shard): None}))
+
+    class Tick(Exception):
+        pass
+
+    def tick(interval):
+        raise Tick
+    monkeypatch.setattr(app.time, 'sleep', tick)
+
+    with pytest.raises(Tick):
+        app.supervise_day_shards()
+    assert sorted(started) == ['20240102', today]  # 20240101 has no backlog and is never polled again